@@ -0,0 +1,397 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The benchmark of object storage adaptor against a local S3 compatible server
+(MinIO or moto server). The results are written as json, and can be compared
+with the results of previous release by `--baseline`.
+
+    poetry run python benchmarks/object_storage.py --endpoint localhost:9000 --output result.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from datetime import timezone
+from typing import Awaitable
+from typing import Callable
+from typing import List
+
+from botocore.exceptions import ClientError
+
+from common.object_storage_adaptor.boto3_admin_client import Boto3AdminClient
+from common.object_storage_adaptor.boto3_client import Boto3Client
+from common.object_storage_adaptor.metrics import InMemoryMetricsRecorder
+
+MiB = 1024 * 1024
+_SIZE_UNITS = {'KiB': 1024, 'MiB': MiB, 'GiB': 1024 * MiB}
+_MINIO_IMAGE = 'minio/minio:latest'
+_PRESIGNED_URL_BATCH = 1000
+
+
+def _parse_size(value: str) -> int:
+    for unit, factor in _SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * factor)
+
+    return int(value)
+
+
+def _parse_list(value: str, parse: Callable = int) -> List:
+    return [parse(item) for item in value.split(',') if item]
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _summarize(operation: str, samples: List[float], size: int = 0, concurrency: int = 1, count: int = 1) -> dict:
+    """
+    Summary:
+        The function summarizes the latency of repeated runs. The `count` is
+        the number of operations in each run(eg. the urls in a batch), and the
+        throughput is based on median latency.
+    """
+    p50 = statistics.median(samples)
+    return {
+        'operation': operation,
+        'size': size,
+        'concurrency': concurrency,
+        'count': count,
+        'repeat': len(samples),
+        'latency': {
+            'min': min(samples),
+            'p50': p50,
+            'p90': _percentile(samples, 90),
+            'p99': _percentile(samples, 99),
+            'max': max(samples),
+            'mean': statistics.mean(samples),
+        },
+        'ops_per_second': count / p50 if p50 > 0 else 0,
+        'throughput_mib_s': size / MiB / p50 if p50 > 0 and size else 0,
+    }
+
+
+async def _measure(run: Callable[[], Awaitable], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        await run()
+
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        await run()
+        samples.append(time.perf_counter() - start_time)
+
+    return samples
+
+
+class Benchmark:
+    """
+    Summary:
+        The benchmark cases. All the objects are created under an unique
+        prefix of the run, and removed after the run.
+    """
+
+    def __init__(self, client: Boto3Client, bucket: str, workdir: str, repeat: int, part_size: int) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.workdir = workdir
+        self.repeat = repeat
+        self.part_size = part_size
+        self.prefix = 'benchmark-%s/' % uuid.uuid4().hex
+
+    def _local_file(self, size: int) -> str:
+        local_path = os.path.join(self.workdir, 'source-%s' % size)
+        if not os.path.exists(local_path):
+            with open(local_path, 'wb') as f:
+                for offset in range(0, size, MiB):
+                    f.write(os.urandom(min(MiB, size - offset)))
+
+        return local_path
+
+    async def _put_object(self, key: str, size: int) -> None:
+        await self.client.upload_file(self.bucket, key, self._local_file(size), part_size=self.part_size)
+
+    async def part_upload(self, size: int, concurrency: int) -> dict:
+        """
+        Summary:
+            The multipart upload with `part_upload` in parallel and `combine_chunks`.
+        """
+        content = memoryview(bytearray(os.urandom(min(size, self.part_size))))
+        part_count = max(1, math.ceil(size / self.part_size))
+        key = self.prefix + 'part-upload-%s-%s' % (size, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _upload_part(upload_id: str, part_number: int) -> dict:
+            length = min(self.part_size, size - (part_number - 1) * self.part_size)
+            async with semaphore:
+                return await self.client.part_upload(self.bucket, key, upload_id, part_number, content[:length])
+
+        async def _run() -> None:
+            upload_id = (await self.client.prepare_multipart_upload(self.bucket, [key]))[0]
+            parts = await asyncio.gather(*[_upload_part(upload_id, number) for number in range(1, part_count + 1)])
+            await self.client.combine_chunks(self.bucket, key, upload_id, list(parts))
+
+        return _summarize('part_upload', await _measure(_run, self.repeat), size, concurrency)
+
+    async def download_object(self, size: int, concurrency: int) -> dict:
+        """
+        Summary:
+            The download by `download_object`, or by `download_object_in_parts`
+            if concurrency is more than 1.
+        """
+        key = self.prefix + 'download-%s' % size
+        await self._put_object(key, size)
+        local_path = os.path.join(self.workdir, 'download-%s-%s' % (size, concurrency))
+
+        if concurrency == 1:
+            operation = 'download_object'
+
+            async def _run() -> None:
+                await self.client.download_object(self.bucket, key, local_path)
+
+        else:
+            operation = 'download_object_in_parts'
+
+            async def _run() -> None:
+                await self.client.download_object_in_parts(
+                    self.bucket, key, local_path, part_size=self.part_size, concurrency=concurrency
+                )
+
+        return _summarize(operation, await _measure(_run, self.repeat), size, concurrency)
+
+    async def copy_object(self, size: int, concurrency: int) -> dict:
+        """
+        Summary:
+            The server side copy. The multipart copy is used with the benchmark
+            part size, so the concurrency takes effect on large objects.
+        """
+        key = self.prefix + 'copy-source-%s' % size
+        await self._put_object(key, size)
+
+        async def _run() -> None:
+            await self.client.copy_object(
+                self.bucket,
+                key,
+                self.bucket,
+                key + '-copy-%s' % concurrency,
+                size=size,
+                multipart_threshold=self.part_size,
+                part_size=self.part_size,
+                concurrency=concurrency,
+            )
+
+        return _summarize('copy_object', await _measure(_run, self.repeat), size, concurrency)
+
+    async def presigned_urls(self) -> List[dict]:
+        """
+        Summary:
+            The download url by boto3 one by one, and by local signer in batch.
+        """
+        keys = [self.prefix + 'presigned-%s' % i for i in range(_PRESIGNED_URL_BATCH)]
+
+        async def _run_single() -> None:
+            for key in keys:
+                await self.client.get_download_presigned_url(self.bucket, key)
+
+        async def _run_batch() -> None:
+            await self.client.get_download_presigned_urls(self.bucket, keys)
+
+        return [
+            _summarize('get_download_presigned_url', await _measure(_run_single, self.repeat), count=len(keys)),
+            _summarize('get_download_presigned_urls', await _measure(_run_batch, self.repeat), count=len(keys)),
+        ]
+
+    async def get_sts(self, token: str) -> List[dict]:
+        """
+        Summary:
+            The temporary credentials from server, and from process wide cache.
+        """
+        samples = await _measure(lambda: self.client._get_sts(token), self.repeat)
+        cached_samples = await _measure(lambda: self.client._get_cached_sts(token), self.repeat)
+
+        return [_summarize('_get_sts', samples), _summarize('_get_cached_sts', cached_samples)]
+
+    async def cleanup(self) -> None:
+        await self.client.delete_prefix(self.bucket, self.prefix)
+
+
+def _start_minio(access_key: str, secret_key: str, image: str):
+    # testcontainers is a dev dependency, only needed to start the server
+    from testcontainers.core.container import DockerContainer
+    from testcontainers.core.waiting_utils import wait_for_logs
+
+    container = (
+        DockerContainer(image)
+        .with_command('server /data')
+        .with_exposed_ports(9000)
+        .with_env('MINIO_ROOT_USER', access_key)
+        .with_env('MINIO_ROOT_PASSWORD', secret_key)
+    )
+    container.start()
+    wait_for_logs(container, 'API:', timeout=60)
+
+    return container, '%s:%s' % (container.get_container_host_ip(), container.get_exposed_port(9000))
+
+
+async def _create_bucket(endpoint: str, access_key: str, secret_key: str, bucket: str) -> None:
+    admin_client = Boto3AdminClient(endpoint, access_key, secret_key)
+    await admin_client.init_connection()
+    try:
+        await admin_client.create_bucket(bucket)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+            raise
+
+
+async def _run_transfers(benchmark: Benchmark, sizes: List[int], concurrencies: List[int]) -> List[dict]:
+    results = []
+    for size in sizes:
+        for concurrency in concurrencies:
+            results.append(await benchmark.part_upload(size, concurrency))
+            results.append(await benchmark.download_object(size, concurrency))
+            results.append(await benchmark.copy_object(size, concurrency))
+
+    return results
+
+
+async def run(args: argparse.Namespace, endpoint: str) -> dict:
+    await _create_bucket(endpoint, args.access_key, args.secret_key, args.bucket)
+
+    metrics = InMemoryMetricsRecorder()
+    client = Boto3Client(endpoint, access_key=args.access_key, secret_key=args.secret_key)
+    client.metrics = metrics
+    await client.init_connection()
+
+    skipped = []
+    with tempfile.TemporaryDirectory() as workdir:
+        benchmark = Benchmark(client, args.bucket, workdir, args.repeat, args.part_size)
+        try:
+            results = await _run_transfers(benchmark, args.sizes, args.concurrency)
+            results.extend(await benchmark.presigned_urls())
+            if args.token:
+                results.extend(await benchmark.get_sts(args.token))
+            else:
+                skipped.append({'operation': '_get_sts', 'reason': 'no --token for AssumeRoleWithWebIdentity'})
+        finally:
+            await benchmark.cleanup()
+            await client.close()
+
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'endpoint': endpoint,
+        'python': platform.python_version(),
+        'parameters': {
+            'sizes': args.sizes,
+            'concurrency': args.concurrency,
+            'repeat': args.repeat,
+            'part_size': args.part_size,
+        },
+        'results': results,
+        'skipped': skipped,
+        'metrics': metrics.snapshot(),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Summary:
+        The function compares the median latency of each case with the
+        baseline report, and returns the cases slower than the tolerance.
+    """
+
+    def _key(result: dict) -> tuple:
+        return result['operation'], result['size'], result['concurrency']
+
+    baseline_results = {_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        previous = baseline_results.get(_key(result))
+        if previous is None:
+            continue
+
+        ratio = result['latency']['p50'] / previous['latency']['p50']
+        if ratio > 1 + tolerance:
+            regressions.append('%s size=%s concurrency=%s is %.0f%% slower' % (_key(result) + ((ratio - 1) * 100,)))
+
+    return regressions
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint', default='localhost:9000', help='the endpoint without http schema')
+    parser.add_argument('--access-key', default='minioadmin')
+    parser.add_argument('--secret-key', default='minioadmin')
+    parser.add_argument('--bucket', default='benchmark')
+    parser.add_argument('--token', help='the SSO token to benchmark AssumeRoleWithWebIdentity')
+    parser.add_argument('--sizes', default='1MiB,16MiB,128MiB', type=lambda value: _parse_list(value, _parse_size))
+    parser.add_argument('--concurrency', default='1,4,16', type=_parse_list)
+    parser.add_argument('--part-size', default='8MiB', type=_parse_size)
+    parser.add_argument('--repeat', default=5, type=int)
+    parser.add_argument('--output', help='the json file of results, default is stdout')
+    parser.add_argument('--baseline', help='the json results of previous run to compare with')
+    parser.add_argument('--tolerance', default=0.2, type=float, help='the allowed slowdown against baseline')
+    parser.add_argument('--start-minio', action='store_true', help='start a MinIO container with testcontainers')
+    parser.add_argument('--minio-image', default=_MINIO_IMAGE)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+
+    container = None
+    endpoint = args.endpoint
+    if args.start_minio:
+        container, endpoint = _start_minio(args.access_key, args.secret_key, args.minio_image)
+
+    try:
+        report = asyncio.run(run(args, endpoint))
+    finally:
+        if container is not None:
+            container.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            sys.stderr.write('Regression: %s\n' % regression)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -14,6 +14,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from .boto3_admin_client import get_boto3_admin_client
+from .boto3_client import MultipartUploadPreparationError
+from .boto3_client import PartUploadError
 from .boto3_client import TokenError
 from .boto3_client import get_boto3_client
 from .minio_policy_client import PolicyDoesNotExist
@@ -0,0 +1,156 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import time
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import Union
+
+# the size of each chunk charged to the bucket, smaller chunk gives smoother rate
+_THROTTLE_CHUNK_SIZE = 256 * 1024
+
+
+class TokenBucket:
+    """
+    Summary:
+        The token bucket to limit the bytes per second. The bucket is refilled
+        at `rate` and holds at most `burst` bytes. The consumer can take more
+        than available tokens, the bucket goes into debt and the consumer waits
+        until the debt is paid, so the large chunk is never starved.
+    """
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        """
+        Parameter:
+            - rate(float): the bytes per second
+            - burst(float): the max bytes can be sent at once, default is one
+                second of rate
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        """
+        Summary:
+            The function takes the tokens and returns how long the caller
+            should wait before sending the bytes.
+
+        Parameter:
+            - amount(int): the number of bytes
+
+        return:
+            - float: the seconds to wait
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0
+
+        return -self.tokens / self.rate
+
+    async def consume(self, amount: int) -> None:
+        delay = self.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_process_bucket = None
+
+
+def set_process_bandwidth_limit(rate: float = None, burst: float = None) -> None:
+    """
+    Summary:
+        The function sets the budget shared by all the clients in process.
+        Set None to remove the limit.
+
+    Parameter:
+        - rate(float): the bytes per second
+        - burst(float): the max bytes can be sent at once
+    """
+    global _process_bucket
+    _process_bucket = TokenBucket(rate, burst) if rate else None
+
+
+def get_process_bandwidth_limit() -> TokenBucket:
+    return _process_bucket
+
+
+class BandwidthLimiter:
+    """
+    Summary:
+        The limiter of one client. Every chunk is charged to the bucket of
+        client and the process-wide bucket, and waits for the slower one.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None) -> None:
+        """
+        Parameter:
+            - rate(float): the bytes per second of client, None for no limit
+            - burst(float): the max bytes can be sent at once
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.bucket is not None or _process_bucket is not None
+
+    async def consume(self, amount: int) -> None:
+        """
+        Summary:
+            The function waits until the bytes are allowed by all budgets.
+
+        Parameter:
+            - amount(int): the number of bytes
+        """
+        delay = 0
+        for bucket in (self.bucket, _process_bucket):
+            if bucket is not None:
+                delay = max(delay, bucket.reserve(amount))
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def limit_stream(self, content: Union[bytes, AsyncIterable]) -> AsyncIterator:
+        """
+        Summary:
+            The function wraps the request content, each chunk is sent after
+            it is allowed by the budgets.
+
+        Parameter:
+            - content(bytes or async iterable): the content of request
+
+        return:
+            - async iterator
+        """
+        if isinstance(content, bytes):
+            buffer = memoryview(content)
+            for offset in range(0, len(buffer), _THROTTLE_CHUNK_SIZE):
+                end = offset + _THROTTLE_CHUNK_SIZE
+                await self.consume(len(buffer[offset:end]))
+                yield buffer[offset:end]
+            return
+
+        async for chunk in content:
+            await self.consume(len(chunk))
+            yield chunk
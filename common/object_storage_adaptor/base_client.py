@@ -36,6 +36,9 @@ class BaseClient:
         # initially only print out error info
         self.logger.setLevel(ERROR)
 
+        # the recorder of metrics, default is the process-wide one
+        self.metrics = None
+
     async def debug_on(self):
         """
         Summary:
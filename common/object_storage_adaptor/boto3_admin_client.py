@@ -17,6 +17,7 @@ import aioboto3
 from botocore.client import Config
 
 from common.object_storage_adaptor.base_client import BaseClient
+from common.object_storage_adaptor.metrics import tracked
 
 _SIGNATURE_VERSTION = 's3v4'
 
@@ -63,6 +64,7 @@ class Boto3AdminClient(BaseClient):
 
         self._session = aioboto3.Session(aws_access_key_id=self.access_key, aws_secret_access_key=self.secret_key)
 
+    @tracked
     async def create_bucket(self, bucket: str):
         """
         Summary:
@@ -89,6 +91,7 @@ class Boto3AdminClient(BaseClient):
 
         return res
 
+    @tracked
     async def create_bucket_encryption(self, bucket: str, algorithm: str = 'AES256') -> dict:
         """
         Summary:
@@ -122,6 +125,7 @@ class Boto3AdminClient(BaseClient):
 
             return res
 
+    @tracked
     async def set_bucket_versioning(self, bucket: str, status: str = 'Enabled') -> dict:
         """
         Summary:
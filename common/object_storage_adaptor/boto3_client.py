@@ -13,29 +13,352 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import hashlib
+import inspect
 import json
+import math
 import os
+import time
+import weakref
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
 import aioboto3
 import httpx
 import xmltodict
 from botocore.client import Config
+from botocore.exceptions import ClientError
+from botocore.paginate import TokenEncoder
 
+from common.object_storage_adaptor.bandwidth_limiter import BandwidthLimiter
 from common.object_storage_adaptor.base_client import BaseClient
+from common.object_storage_adaptor.etag import etag_matches
+from common.object_storage_adaptor.metrics import MetricsRecorder
+from common.object_storage_adaptor.metrics import record_bytes
+from common.object_storage_adaptor.metrics import tracked
+from common.object_storage_adaptor.part_content import FileSegment
+from common.object_storage_adaptor.part_content import PartContent
+from common.object_storage_adaptor.part_content import get_content_length
+from common.object_storage_adaptor.part_content import to_request_content
+from common.object_storage_adaptor.part_size import PartSizePolicy
+from common.object_storage_adaptor.presigner import S3Presigner
+from common.object_storage_adaptor.sync_manifest import SYNC_MANIFEST_NAME
+from common.object_storage_adaptor.sync_manifest import SyncManifest
+from common.object_storage_adaptor.sync_manifest import folder_prefix
+from common.object_storage_adaptor.sync_manifest import join_key
+from common.object_storage_adaptor.sync_manifest import local_path_of
+from common.object_storage_adaptor.sync_manifest import relative_key
+from common.object_storage_adaptor.sync_manifest import walk_local_files
+from common.object_storage_adaptor.transfer_controller import TransferController
+from common.object_storage_adaptor.ttl_cache import TTLCache
+from common.object_storage_adaptor.upload_checkpoint import UploadCheckpoint
 
 _SIGNATURE_VERSTION = 's3v4'
+_MAX_POOL_CONNECTIONS = 10
+_DEFAULT_PART_SIZE = 8 * 1024 * 1024
+_DEFAULT_CONCURRENCY = 4
+_DEFAULT_BATCH_CONCURRENCY = 16
+_STAT_CACHE_SIZE = 1024
+_MAX_PART_COUNT = 10000
+_MULTIPART_COPY_THRESHOLD = 1024 * 1024 * 1024
+_COPY_PART_SIZE = 256 * 1024 * 1024
+# the signing region of s3 used by botocore when no region is configured
+_DEFAULT_REGION = 'us-east-1'
+# the max size of object allowed by single copy
+_MAX_SINGLE_COPY_SIZE = 5 * 1024 * 1024 * 1024
+# the error codes of single copy when the source is larger than 5GB
+_COPY_SOURCE_TOO_LARGE_CODES = {'EntityTooLarge', 'InvalidRequest'}
+# the user metadata recording the part size of multipart upload, which is
+# needed to compute the ETag of local file
+_PART_SIZE_METADATA = 'part-size'
+# the headers of source object kept by multipart copy
+_COPIED_OBJECT_HEADERS = (
+    'CacheControl',
+    'ContentDisposition',
+    'ContentEncoding',
+    'ContentLanguage',
+    'ContentType',
+    'Expires',
+    'Metadata',
+)
+# the max number of keys in one DeleteObjects request
+_DELETE_BATCH_SIZE = 1000
+# the max number of listed objects buffered in fan out listing
+_LIST_QUEUE_SIZE = 10000
+# the cached presigned url is reused only if more than half of duration is left
+_PRESIGNED_URL_REUSE_RATIO = 0.5
+_STREAM_CHUNK_SIZE = 1024 * 1024
+_SMALL_OBJECT_THRESHOLD = 8 * 1024 * 1024
+_STS_CACHE_SIZE = 1024
+# the cached credentials are dropped a bit earlier than the expiration
+_STS_EXPIRY_MARGIN = 60
+# the cached credentials are refreshed in background within this window
+_STS_REFRESH_WINDOW = 600
+
+# the temporary credentials shared by all clients in process, keyed
+# by the hash of endpoint and token. the values are (credentials, expire_at)
+_sts_cache = TTLCache(_STS_CACHE_SIZE, 0)
+# the running requests of credentials, so the same token is only exchanged once
+_sts_requests = {}
 
 
 class TokenError(Exception):
     pass
 
 
+class MultipartUploadPreparationError(Exception):
+    """
+    Summary:
+        The error raised when some of the keys fail in `prepare_multipart_upload`.
+
+    Attribute:
+        - upload_ids(list): the upload id of each key, None if the key failed
+        - errors(dict): the error of each failed key
+    """
+
+    def __init__(self, message: str, upload_ids: List[str], errors: Dict[str, Exception]) -> None:
+        super().__init__(message)
+        self.upload_ids = upload_ids
+        self.errors = errors
+
+
+class PartUploadError(Exception):
+    """
+    Summary:
+        The error raised when the server rejects the part in `part_upload`.
+
+    Attribute:
+        - status_code(int): the http status code of response
+    """
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _write_file_range(local_path: str, offset: int, content: bytes) -> None:
+    with open(local_path, 'r+b') as f:
+        f.seek(offset)
+        f.write(content)
+
+
+def _is_invalid_range(error: ClientError) -> bool:
+    # the range starting after end of object is rejected with 416
+    return error.response.get('Error', {}).get('Code') == 'InvalidRange'
+
+
+def _read_file(local_path: str) -> bytes:
+    with open(local_path, 'rb') as f:
+        return f.read()
+
+
+def _allocate_file(local_path: str, size: int) -> None:
+    with open(local_path, 'wb') as f:
+        f.truncate(size)
+
+
+def _make_parent_directory(local_path: str) -> None:
+    directory = os.path.dirname(local_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+
+def _get_expire_at(credentials: dict) -> float:
+    """
+    Summary:
+        The function parses the `Expiration` of temporary credentials
+        into timestamp. None will be returned if it is missing or invalid.
+    """
+    expiration = credentials.get('Expiration')
+    if not expiration:
+        return None
+
+    try:
+        expire_at = datetime.fromisoformat(expiration.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+    if expire_at.tzinfo is None:
+        expire_at = expire_at.replace(tzinfo=timezone.utc)
+
+    return expire_at.timestamp()
+
+
+async def _drain_queue(queue: asyncio.Queue, producers: int) -> AsyncIterator:
+    """
+    Summary:
+        The function yields the items from queue until all the producers put
+        None to finish. The error put by producer will be raised.
+    """
+    while producers:
+        item = await queue.get()
+        if item is None:
+            producers -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield item
+
+
+async def _report_progress(progress_callback: Callable[[dict], None], progress: dict) -> None:
+    if progress_callback is None:
+        return
+
+    callback_result = progress_callback(progress)
+    if inspect.isawaitable(callback_result):
+        await callback_result
+
+
+async def _gather_or_cancel(aws: Iterable[Awaitable]) -> list:
+    """
+    Summary:
+        The function works like `asyncio.gather` but cancels all the
+        pending jobs once one of them fails, so no more requests will
+        be sent after the failure.
+
+    Parameter:
+        - aws(list of awaitable): the jobs to run
+
+    return:
+        - list: the results in the same order as input
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _run_concurrently(items: AsyncIterator, handle: Callable[[Any], Awaitable], concurrency: int) -> None:
+    """
+    Summary:
+        The function consumes the items by a pool of workers. The items are
+        pulled into a bounded queue, so the memory doesn't grow with number
+        of items.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def _produce() -> None:
+        async for item in items:
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def _consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await handle(item)
+
+    await _gather_or_cancel([_produce()] + [_consume() for _ in range(concurrency)])
+
+
+def _is_local_file_unchanged(local_path: str, entry: dict) -> bool:
+    try:
+        stat = os.stat(local_path)
+    except OSError:
+        return False
+
+    return stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']
+
+
+def _delete_local_for_sync(local_dir: str, manifest: SyncManifest, relative_paths: set) -> int:
+    for relative_path in relative_paths:
+        local_path = local_path_of(local_dir, relative_path)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        manifest.pop(relative_path)
+
+    return len(relative_paths)
+
+
+class _ConnectionPool:
+    """
+    Summary:
+        The pooled s3 client and http client of one Boto3Client. It is kept
+        apart from the client, so it can still be closed after the client
+        is garbage collected.
+    """
+
+    def __init__(self) -> None:
+        self.client_context = None
+        self.client = None
+        self.http_client = None
+        # the loop which the clients are bound to
+        self.loop = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.client_context is not None or self.http_client is not None
+
+    async def close(self) -> None:
+        if self.client_context is not None:
+            client_context = self.client_context
+            self.client_context = None
+            self.client = None
+            await client_context.__aexit__(None, None, None)
+
+        if self.http_client is not None:
+            http_client = self.http_client
+            self.http_client = None
+            await http_client.aclose()
+
+
+def _close_pool_in_background(pool: _ConnectionPool) -> None:
+    """
+    Summary:
+        The finalizer of Boto3Client which is dropped without `close()`, eg.
+        the client created for each request. The connections are closed on
+        the loop they belong to, so the sockets are not leaked.
+    """
+    if pool.is_open and pool.loop is not None and pool.loop.is_running():
+        # the close only runs in later iterations of the loop, it is dropped as
+        # never awaited if the loop is closed before that. so the short-lived
+        # loops(eg. one per test) should close the clients explicitly
+        pool.loop.call_soon_threadsafe(lambda: asyncio.ensure_future(pool.close()))
+
+
 async def get_boto3_client(
-    endpoint: str, token: str = None, access_key: str = None, secret_key: str = None, https: bool = False
+    endpoint: str,
+    token: str = None,
+    access_key: str = None,
+    secret_key: str = None,
+    https: bool = False,
+    **kwargs,
 ):
+    """
+    Summary:
+        The function will create the Boto3Client and setup the connection.
+        The extra keyword arguments(eg. max_pool_connections, stat_cache_ttl)
+        are passed to Boto3Client.
+
+        The client keeps a connection pool, which should be closed by `close()`
+        when the client is no longer used. The pool of client dropped without
+        closing is closed in background once the client is garbage collected.
+
+            client = await get_boto3_client(endpoint, token=token)
+            try:
+                await client.stat_object(bucket, key)
+            finally:
+                await client.close()
+    """
 
-    mc = Boto3Client(endpoint, token, access_key, secret_key, https)
+    mc = Boto3Client(endpoint, token, access_key, secret_key, https, **kwargs)
     await mc.init_connection()
 
     return mc
@@ -52,12 +375,41 @@ class Boto3Client(BaseClient):
             - presigned-upload-url
             - part upload
             - combine parts on server side
+            - parallel and resumable multipart upload of local file
+            - parallel ranged download of object
+            - streaming read of object
+            - listing of objects
+            - batch delete of objects
+            - parallel multipart copy of large object
+            - copy all objects under a prefix
         The initialization will require either jwt token or access key +
         secret key from object storage
+
+        The client keeps one long-lived s3 client(and http client) with a
+        connection pool, which is shared by all the operations. It can be
+        used as async context manager, or closed by `close()` explicitly:
+
+            async with Boto3Client(endpoint, token=token) as client:
+                await client.stat_object(bucket, key)
+
+        If the client is dropped without closing, the pool is closed in
+        background when the client is garbage collected.
     """
 
     def __init__(
-        self, endpoint: str, token: str = None, access_key: str = None, secret_key: str = None, https: bool = False
+        self,
+        endpoint: str,
+        token: str = None,
+        access_key: str = None,
+        secret_key: str = None,
+        https: bool = False,
+        max_pool_connections: int = _MAX_POOL_CONNECTIONS,
+        stat_cache_ttl: float = 0,
+        stat_cache_size: int = _STAT_CACHE_SIZE,
+        presigned_url_cache_size: int = 0,
+        part_size_policy: PartSizePolicy = None,
+        transfer_controller: TransferController = None,
+        bandwidth_limit: float = None,
     ) -> None:
         """
         Parameter:
@@ -66,6 +418,21 @@ class Boto3Client(BaseClient):
             - access_key(str): the access key of object storage
             - secret key(str): the secret key of object storage
             - https(bool): the bool to indicate if it is https connection
+            - max_pool_connections(int): the max number of keep-alive connections
+                in the shared connection pool
+            - stat_cache_ttl(float): how many seconds the result of `stat_object`
+                will be cached in process. The cache is disabled by default(0)
+            - stat_cache_size(int): the max number of cached `stat_object` results
+            - presigned_url_cache_size(int): the max number of cached download presigned
+                urls. The cache is disabled by default(0)
+            - part_size_policy(PartSizePolicy): the policy to choose part size and
+                concurrency of `upload_file`. It can be shared by clients to keep
+                the measured throughput
+            - transfer_controller(TransferController): the controller to retry the
+                idempotent operations and limit the requests in flight. It can be
+                shared by clients to keep the request rate under server capacity
+            - bandwidth_limit(float): the max bytes per second moved by the client,
+                on top of the process-wide limit(see `set_process_bandwidth_limit`)
         """
         client_name = 'Boto3Client'
         super().__init__(client_name)
@@ -79,9 +446,59 @@ class Boto3Client(BaseClient):
         self.secret_key = secret_key
         self.session_token = None
 
-        self._config = Config(signature_version=_SIGNATURE_VERSTION)
+        self.max_pool_connections = max_pool_connections
+        # the retries are done by transfer controller only, so the throttling is seen
+        # by its concurrency limit at once and the requests are not retried twice
+        self._config = Config(
+            signature_version=_SIGNATURE_VERSTION,
+            max_pool_connections=max_pool_connections,
+            retries={'total_max_attempts': 1},
+        )
         self._session = None
 
+        # the pooled clients will be created lazily by first operation
+        self._pool = _ConnectionPool()
+        self._client_lock = None
+        finalizer = weakref.finalize(self, _close_pool_in_background, self._pool)
+        # the loop is stopped at interpreter exit, nothing can be closed then
+        finalizer.atexit = False
+
+        self._stat_cache = TTLCache(stat_cache_size, stat_cache_ttl) if stat_cache_ttl > 0 else None
+
+        # the ttl of each presigned url depends on its duration
+        self._presigned_url_cache = TTLCache(presigned_url_cache_size, 0) if presigned_url_cache_size > 0 else None
+        self._presigner = None
+
+        self.part_size_policy = part_size_policy or PartSizePolicy()
+        # the controller created by client reports to the same recorder as client
+        self._owned_controller = None
+        if transfer_controller is None:
+            transfer_controller = TransferController(logger=self.logger, client_name=self.client_name)
+            transfer_controller.metrics = self.metrics
+            self._owned_controller = transfer_controller
+        self.transfer_controller = transfer_controller
+        self.bandwidth_limiter = BandwidthLimiter(bandwidth_limit)
+
+    @property
+    def metrics(self) -> MetricsRecorder:
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, recorder: MetricsRecorder) -> None:
+        self._metrics = recorder
+        if getattr(self, '_owned_controller', None) is not None:
+            self._owned_controller.metrics = recorder
+
+    async def __aenter__(self) -> 'Boto3Client':
+        if self._session is None:
+            await self.init_connection()
+
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    @tracked
     async def init_connection(self):
         """
         Summary:
@@ -92,11 +509,14 @@ class Boto3Client(BaseClient):
         """
         self.logger.info('Initialize object storage connection')
 
+        # the pooled client is bound to the old credentials
+        await self.close()
+
         # if we receive token by first time
         # ask minio to give the temperary credentials
         if self.token is not None:
             self.logger.info('Get temporary credentials')
-            temp_credentials = await self._get_sts(self.token)
+            temp_credentials = await self._get_cached_sts(self.token)
             self.logger.info('Temporary credentials: %s', json.dumps(temp_credentials))
 
             self.access_key = temp_credentials.get('AccessKeyId')
@@ -108,9 +528,141 @@ class Boto3Client(BaseClient):
             aws_secret_access_key=self.secret_key,
             aws_session_token=self.session_token,
         )
+        # sign with the same region as boto3 client(eg. from AWS_DEFAULT_REGION),
+        # otherwise the urls of presigner and `generate_presigned_url` have different scope
+        self._presigner = S3Presigner(
+            self.endpoint,
+            self.access_key,
+            self.secret_key,
+            self.session_token,
+            region=self._session.region_name or _DEFAULT_REGION,
+        )
+        if self._presigned_url_cache is not None:
+            self._presigned_url_cache.clear()
 
         return
 
+    async def close(self) -> None:
+        """
+        Summary:
+            The async function to close the pooled s3 client and http client.
+            The client can still be used after closing, the pool will be
+            recreated by next operation.
+
+        return:
+            - None
+        """
+        if self._pool.is_open:
+            self.logger.info('Close object storage connection')
+            await self._pool.close()
+
+    async def _get_client(self):
+        """
+        Summary:
+            The function will return the pooled s3 client. The client
+            will be created by first call and reused afterwards.
+
+        return:
+            - s3 client
+        """
+        if self._pool.client is not None:
+            return self._pool.client
+
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+
+        async with self._client_lock:
+            if self._pool.client is None:
+                self.logger.info('Create pooled s3 client with %s connections', self.max_pool_connections)
+                client_context = self._session.client('s3', endpoint_url=self.endpoint, config=self._config)
+                self._pool.client = await client_context.__aenter__()
+                self._pool.client_context = client_context
+                self._pool.loop = asyncio.get_running_loop()
+
+        return self._pool.client
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Summary:
+            The function will return the pooled http client which is used
+            to send the data with presigned url.
+
+        return:
+            - httpx.AsyncClient
+        """
+        if self._pool.http_client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_pool_connections, max_keepalive_connections=self.max_pool_connections
+            )
+            self._pool.http_client = httpx.AsyncClient(limits=limits)
+            self._pool.loop = asyncio.get_running_loop()
+
+        return self._pool.http_client
+
+    async def _get_cached_sts(self, jwt_token: str) -> dict:
+        """
+        Summary:
+            The function returns the temporary credentials from process wide
+            cache, and only calls `_get_sts` if they are missing or expired. The
+            credentials close to expiration will be refreshed in background, so
+            the request scoped clients can start without any network call.
+
+            The credentials without `Expiration` are never cached.
+
+        Parameter:
+            - jwt_token(str): The token get from SSO
+
+        return:
+            - dict
+        """
+        cache_key = hashlib.sha256((self.endpoint + jwt_token).encode()).hexdigest()
+
+        cached = _sts_cache.get(cache_key)
+        if cached is None:
+            return await asyncio.shield(self._request_sts(cache_key, jwt_token))
+
+        credentials, expire_at = cached
+        if expire_at - datetime.now(timezone.utc).timestamp() < _STS_REFRESH_WINDOW:
+            self.logger.info('Refresh temporary credentials in background')
+            task = self._request_sts(cache_key, jwt_token)
+            task.add_done_callback(self._log_sts_refresh_error)
+
+        return credentials
+
+    def _request_sts(self, cache_key: str, jwt_token: str) -> asyncio.Future:
+        """
+        Summary:
+            The function starts the request of temporary credentials and caches
+            the result. The concurrent requests for same token share one job.
+
+        return:
+            - asyncio.Future: the job returns the credentials
+        """
+        task = _sts_requests.get(cache_key)
+        if task is not None:
+            return task
+
+        async def _request() -> dict:
+            credentials = await self._get_sts(jwt_token)
+            expire_at = _get_expire_at(credentials)
+            if expire_at is not None:
+                ttl = expire_at - datetime.now(timezone.utc).timestamp() - _STS_EXPIRY_MARGIN
+                if ttl > 0:
+                    _sts_cache.set(cache_key, (credentials, expire_at), ttl=ttl)
+
+            return credentials
+
+        task = asyncio.ensure_future(_request())
+        _sts_requests[cache_key] = task
+        task.add_done_callback(lambda _: _sts_requests.pop(cache_key, None))
+
+        return task
+
+    def _log_sts_refresh_error(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            error_msg = str(task.exception())
+            self.logger.error('Fail to refresh temporary credentials: %s', error_msg)
+
     async def _get_sts(self, jwt_token: str, duration: int = 86000) -> dict:
         """
         Summary:
@@ -166,10 +718,12 @@ class Boto3Client(BaseClient):
 
         return sts_info
 
+    @tracked
     async def download_object(self, bucket: str, key: str, local_path: str) -> None:
         """
         Summary:
             The function is the boto3 wrapup to download the file from minio
+            With bandwidth limit, the object is streamed into the file under the limit.
 
         Parameter:
             - bucket(str): the bucket name
@@ -182,25 +736,313 @@ class Boto3Client(BaseClient):
         self.logger.info('Downlaod object %s/%s to local path %s', bucket, key, local_path)
 
         # here create directory tree if not exist
-        directory = os.path.dirname(local_path)
-        if not os.path.exists(directory):
-            self.logger.info('Directory %s does not exist. Create the path', directory)
-            os.makedirs(directory)
+        _make_parent_directory(local_path)
+
+        if self.bandwidth_limiter.enabled:
+            # the callback of download_file cannot wait, so stream it with the limit
+            await self._stream_object_to_file(bucket, key, local_path)
+        else:
+            s3 = await self._get_client()
+            await self.transfer_controller.run(lambda: s3.download_file(bucket, key, local_path))
+            # the bytes of stream above are counted by `stream_object` already
+            record_bytes(os.path.getsize(local_path))
+
+    async def _stream_object_to_file(self, bucket: str, key: str, local_path: str) -> None:
+        """
+        Summary:
+            The function streams the object into the temporary file next to
+            local path, and renames it once the object is fully read. So the
+            failed download doesn't leave an empty or truncated file.
+        """
+        loop = asyncio.get_running_loop()
+        tmp_path = local_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                async for chunk in self.stream_object(bucket, key):
+                    await loop.run_in_executor(None, f.write, chunk)
+        except BaseException:
+            self.logger.error('Fail to download object %s/%s, remove %s', bucket, key, tmp_path)
+            os.remove(tmp_path)
+            raise
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            await s3.download_file(bucket, key, local_path)
+        os.replace(tmp_path, local_path)
 
-    async def copy_object(self, source_bucket: str, source_key: str, dest_bucket: str, dest_key: str):
+    async def _read_body(self, body) -> bytes:
+        """
+        Summary:
+            The function reads the whole response body. With bandwidth limit,
+            the body is read chunk by chunk under the limit.
+        """
+        async with body:
+            if not self.bandwidth_limiter.enabled:
+                return await body.read()
+
+            chunks = []
+            while True:
+                chunk = await body.read(_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await self.bandwidth_limiter.consume(len(chunk))
+                chunks.append(chunk)
+
+            return b''.join(chunks)
+
+    @tracked
+    async def download_object_in_parts(
+        self,
+        bucket: str,
+        key: str,
+        local_path: str,
+        part_size: int = _DEFAULT_PART_SIZE,
+        concurrency: int = _DEFAULT_CONCURRENCY,
+        max_retries: int = None,
+    ) -> dict:
+        """
+        Summary:
+            The function will download the object with concurrent http range
+            requests. The local file is preallocated and each range is written
+            at its offset. Every range request will be retried independently
+            and pinned to the ETag of object, so the object cannot be changed
+            in the middle of download.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - local_path(str): the local path to download the file
+            - part_size(int): the size of each range in bytes
+            - concurrency(int): the max number of ranges downloaded at same time
+            - max_retries(int): how many times a failed range will be retried, default
+                is the setting of `transfer_controller`
+
+        return:
+            - object meta
+        """
+        self.logger.info('Download object %s/%s to local path %s in parts', bucket, key, local_path)
+
+        s3 = await self._get_client()
+        meta = await self.transfer_controller.run(lambda: s3.head_object(Bucket=bucket, Key=key))
+        size = meta.get('ContentLength', 0)
+        etag = meta.get('ETag')
+
+        loop = asyncio.get_running_loop()
+        _make_parent_directory(local_path)
+        await loop.run_in_executor(None, _allocate_file, local_path, size)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _download_range(offset: int) -> None:
+            byte_range = 'bytes=%s-%s' % (offset, min(offset + part_size, size) - 1)
+
+            async def _get_range() -> bytes:
+                res = await s3.get_object(Bucket=bucket, Key=key, Range=byte_range, IfMatch=etag)
+                return await self._read_body(res['Body'])
+
+            async with semaphore:
+                content = await self.transfer_controller.run(_get_range, max_retries=max_retries)
+                await loop.run_in_executor(None, _write_file_range, local_path, offset, content)
+            record_bytes(len(content))
+
+        try:
+            await _gather_or_cancel(_download_range(offset) for offset in range(0, size, part_size))
+        except BaseException:
+            self.logger.error('Fail to download object %s/%s, remove %s', bucket, key, local_path)
+            os.remove(local_path)
+            raise
+
+        return meta
+
+    @tracked
+    async def stream_object(
+        self,
+        bucket: str,
+        key: str,
+        chunk_size: int = _STREAM_CHUNK_SIZE,
+        byte_range: Tuple[int, Optional[int]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Summary:
+            The function will read the object as async iterator of chunks
+            directly from the response body, without touching local disk.
+            The memory usage is constant no matter how large the object is.
+            The connection is released once the iteration is finished or
+            the iterator is closed.
+
+                async for chunk in client.stream_object(bucket, key):
+                    await response.write(chunk)
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - chunk_size(int): the max size of each chunk in bytes
+            - byte_range(tuple): the (start, end) offsets to read, both are
+                inclusive. The end can be None to read until end of object
+
+        return:
+            - async iterator of bytes
+        """
+        self.logger.info('Stream object %s/%s with range %s', bucket, key, byte_range)
+
+        params = {'Bucket': bucket, 'Key': key}
+        if byte_range is not None:
+            start, end = byte_range
+            params['Range'] = 'bytes=%s-%s' % (start, '' if end is None else end)
+
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(lambda: s3.get_object(**params))
+        body = res['Body']
+        async with body:
+            while True:
+                chunk = await body.read(chunk_size)
+                if not chunk:
+                    break
+                if self.bandwidth_limiter.enabled:
+                    await self.bandwidth_limiter.consume(len(chunk))
+                yield chunk
+
+    @tracked
+    async def read_range(self, bucket: str, key: str, start: int, end: int = None) -> bytes:
+        """
+        Summary:
+            The function reads the byte range of object with a single http
+            range request, eg. the header of file for preview.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - start(int): the offset of first byte
+            - end(int): the offset of last byte(inclusive), None to read until
+                end of object
+
+        return:
+            - bytes: the content, which is shorter than range at end of object
+        """
+        self.logger.info('Read range %s-%s of %s/%s', start, end, bucket, key)
+
+        byte_range = 'bytes=%s-%s' % (start, '' if end is None else end)
+        s3 = await self._get_client()
+
+        async def _get_range() -> bytes:
+            res = await s3.get_object(Bucket=bucket, Key=key, Range=byte_range)
+            return await self._read_body(res['Body'])
+
+        try:
+            content = await self.transfer_controller.run(_get_range)
+        except ClientError as e:
+            if not _is_invalid_range(e):
+                raise
+            content = b''
+
+        record_bytes(len(content))
+
+        return content
+
+    async def _read_range_into(self, bucket: str, key: str, start: int, buffer: memoryview) -> int:
+        """
+        Summary:
+            The function reads the range of object starting from `start` into
+            the buffer, the size of range is the size of buffer.
+        """
+        if not buffer.nbytes:
+            return 0
+
+        byte_range = 'bytes=%s-%s' % (start, start + buffer.nbytes - 1)
+        s3 = await self._get_client()
+
+        async def _get_range() -> int:
+            res = await s3.get_object(Bucket=bucket, Key=key, Range=byte_range)
+            body = res['Body']
+            position = 0
+            async with body:
+                while True:
+                    chunk = await body.read(_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        return position
+                    if self.bandwidth_limiter.enabled:
+                        await self.bandwidth_limiter.consume(len(chunk))
+                    end = position + len(chunk)
+                    buffer[position:end] = chunk
+                    position = end
+
+        try:
+            size = await self.transfer_controller.run(_get_range)
+        except ClientError as e:
+            if not _is_invalid_range(e):
+                raise
+            size = 0
+
+        record_bytes(size)
+
+        return size
+
+    @tracked
+    async def read_ranges(
+        self,
+        bucket: str,
+        ranges: Iterable[Tuple[str, int, Union[bytearray, memoryview]]],
+        concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[int]:
+        """
+        Summary:
+            The function reads many byte ranges concurrently into the buffers
+            supplied by caller, so no intermediate copy is made. The size of
+            each range is the size of its buffer. If any range fails, the
+            pending ones are cancelled and the error is raised.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - ranges(list of tuple): the (key, start, buffer) of each range, the
+                buffer must be writable(eg. bytearray or memoryview of it)
+            - concurrency(int): the max number of ranges read at same time
+
+        return:
+            - list: the number of bytes read into each buffer, which is less than
+                the buffer at end of object
+        """
+        ranges = list(ranges)
+        self.logger.info('Read %s ranges from %s', len(ranges), bucket)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _read(key: str, start: int, buffer: Union[bytearray, memoryview]) -> int:
+            async with semaphore:
+                return await self._read_range_into(bucket, key, start, memoryview(buffer).cast('B'))
+
+        return await _gather_or_cancel(_read(key, start, buffer) for key, start, buffer in ranges)
+
+    @tracked
+    async def copy_object(
+        self,
+        source_bucket: str,
+        source_key: str,
+        dest_bucket: str,
+        dest_key: str,
+        size: int = None,
+        multipart_threshold: int = _MULTIPART_COPY_THRESHOLD,
+        part_size: int = _COPY_PART_SIZE,
+        concurrency: int = _DEFAULT_CONCURRENCY,
+    ):
         """
         Summary:
             The function is the boto3 wrapup to copy the file on server side.
-            Note here the single copy will only allow the upto 5GB
+            Note here the single copy will only allow the upto 5GB. So the object
+            larger than `multipart_threshold` will be copied by multipart upload,
+            which copies the byte ranges of source object in parallel on server side.
+            The multipart copy keeps the content type and metadata of source.
+
+            If `size` is not given, the single copy is tried first, so the small
+            objects don't pay an extra HEAD request. When it is rejected, the source
+            is checked and the multipart copy is only used if it is larger than
+            `multipart_threshold` or 5GB, otherwise the error is raised.
 
         Parameter:
             - source_bucket(str): the name of source bucket
             - source_key(str): the key of source path
             - dest_bucket(str): the name of destination bucket
             - dest_key(str): the key of destination path
+            - size(int): the size of source object
+            - multipart_threshold(int): the size above which multipart copy is used
+            - part_size(int): the size of each part in multipart copy
+            - concurrency(int): the max number of parts copied at same time
 
         return:
             - object meta
@@ -208,11 +1050,180 @@ class Boto3Client(BaseClient):
         self.logger.info('Copy object %s/%s to destination %s/%s', source_bucket, source_key, dest_bucket, dest_key)
 
         source_file = os.path.join(source_bucket, source_key)
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            res = await s3.copy_object(Bucket=dest_bucket, CopySource=source_file, Key=dest_key)
+        if size is None or size <= multipart_threshold:
+            s3 = await self._get_client()
+            try:
+                res = await self.transfer_controller.run(
+                    lambda: s3.copy_object(Bucket=dest_bucket, CopySource=source_file, Key=dest_key)
+                )
+            except ClientError as e:
+                if size is not None or e.response.get('Error', {}).get('Code') not in _COPY_SOURCE_TOO_LARGE_CODES:
+                    raise
+                # the same codes are used for other rejections, eg. copying the object
+                # to itself without any change. so only the source which is really
+                # too large goes to multipart copy
+                meta = await self.stat_object(source_bucket, source_key)
+                if meta.get('ContentLength', 0) <= min(multipart_threshold, _MAX_SINGLE_COPY_SIZE):
+                    raise
+                self.logger.info('Source %s is too large for single copy, use multipart copy', source_file)
+            else:
+                self._invalidate_stat(dest_bucket, dest_key)
+                return res
+        else:
+            # the content type and metadata of source are needed to create the upload
+            meta = await self.stat_object(source_bucket, source_key)
+
+        return await self._multipart_copy_object(source_file, dest_bucket, dest_key, meta, part_size, concurrency)
+
+    async def _multipart_copy_object(
+        self,
+        source_file: str,
+        dest_bucket: str,
+        dest_key: str,
+        meta: dict,
+        part_size: int,
+        concurrency: int,
+    ) -> dict:
+        """
+        Summary:
+            The function copies the object by `upload_part_copy` with concurrent
+            byte ranges, the data never leaves the object storage. The part size
+            will be enlarged if the object needs more than 10000 parts. The upload
+            is created with the headers of source from `meta`(the result of HEAD).
+        """
+        size = meta.get('ContentLength', 0)
+        source_etag = meta.get('ETag')
+        part_size = max(part_size, math.ceil(size / _MAX_PART_COUNT))
+        part_count = math.ceil(size / part_size)
+
+        extra_args = {header: meta[header] for header in _COPIED_OBJECT_HEADERS if meta.get(header) is not None}
+        # the copy has its own parts, so the part size of source doesn't apply
+        extra_args['Metadata'] = dict(meta.get('Metadata', {}), **{_PART_SIZE_METADATA: str(part_size)})
+        self.logger.info('Copy %s to %s/%s in %s parts', source_file, dest_bucket, dest_key, part_count)
+
+        upload_id = (await self.prepare_multipart_upload(dest_bucket, [dest_key], extra_args=extra_args))[0]
+
+        s3 = await self._get_client()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _copy_part(part_number: int) -> dict:
+            start = (part_number - 1) * part_size
+            end = min(start + part_size, size) - 1
+            params = {
+                'Bucket': dest_bucket,
+                'Key': dest_key,
+                'CopySource': source_file,
+                'CopySourceRange': 'bytes=%s-%s' % (start, end),
+                'PartNumber': part_number,
+                'UploadId': upload_id,
+            }
+            # make sure all the parts are copied from same object
+            if source_etag is not None:
+                params['CopySourceIfMatch'] = source_etag
+
+            async with semaphore:
+                res = await self.transfer_controller.run(lambda: s3.upload_part_copy(**params))
+
+            etag = res.get('CopyPartResult', {}).get('ETag', '').replace('"', '')
+
+            return {'ETag': etag, 'PartNumber': part_number}
 
-        return res
+        try:
+            parts = await _gather_or_cancel(_copy_part(part_number) for part_number in range(1, part_count + 1))
+        except BaseException:
+            self.logger.error('Fail to copy %s, abort the upload %s', source_file, upload_id)
+            await self._abort_silently(dest_bucket, dest_key, upload_id)
+            raise
+
+        return await self.combine_chunks(dest_bucket, dest_key, upload_id, parts)
+
+    @tracked
+    async def copy_prefix(
+        self,
+        source_bucket: str,
+        source_prefix: str,
+        dest_bucket: str,
+        dest_prefix: str,
+        concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+        progress_callback: Callable[[dict], None] = None,
+    ) -> dict:
+        """
+        Summary:
+            The function will copy all the objects under source prefix to the
+            destination prefix on server side. The source listing is streamed
+            into a bounded queue and the objects are copied by a pool of workers,
+            so the memory doesn't grow with number of objects. The large objects
+            will be copied by multipart copy(see `copy_object`).
+
+            The failed object will not stop the pipeline, the error is collected
+            in the result instead. The prefixes are folders, the objects keep the
+            path relative to source prefix, and the folder markers or the keys
+            which cannot be mapped(eg. with `..`) are skipped.
+
+        Parameter:
+            - source_bucket(str): the name of source bucket
+            - source_prefix(str): the folder of source objects, `/` is appended if missing
+            - dest_bucket(str): the name of destination bucket
+            - dest_prefix(str): the folder of destination objects, `/` is appended if missing
+            - concurrency(int): the max number of objects copied at same time
+            - progress_callback(callable): the function(or coroutine function) called
+                after each object with dict of key, dest_key, size, error,
+                copied_count and copied_bytes
 
+        return:
+            - dict: the copied_count, copied_bytes and the errors of failed keys
+        """
+        self.logger.info(
+            'Copy prefix %s/%s to destination %s/%s', source_bucket, source_prefix, dest_bucket, dest_prefix
+        )
+
+        source_prefix = folder_prefix(source_prefix)
+        queue = asyncio.Queue(maxsize=concurrency * 2)
+        result = {'copied_count': 0, 'copied_bytes': 0, 'errors': {}}
+
+        async def _produce() -> None:
+            async for obj in self.iter_objects(source_bucket, source_prefix):
+                relative_path = relative_key(obj['Key'], source_prefix)
+                if relative_path is not None:
+                    await queue.put((obj, join_key(dest_prefix, relative_path)))
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def _copy() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+
+                obj, dest_key = item
+                key = obj['Key']
+                error_msg = None
+                try:
+                    await self.copy_object(source_bucket, key, dest_bucket, dest_key, size=obj.get('Size'))
+                    result['copied_count'] += 1
+                    result['copied_bytes'] += obj.get('Size', 0)
+                except Exception as e:
+                    error_msg = str(e)
+                    self.logger.error('Fail to copy %s/%s: %s', source_bucket, key, error_msg)
+                    result['errors'][key] = error_msg
+
+                progress = {
+                    'key': key,
+                    'dest_key': dest_key,
+                    'size': obj.get('Size', 0),
+                    'error': error_msg,
+                    'copied_count': result['copied_count'],
+                    'copied_bytes': result['copied_bytes'],
+                }
+                await _report_progress(progress_callback, progress)
+
+        await _gather_or_cancel([_produce()] + [_copy() for _ in range(concurrency)])
+
+        self.logger.info('Copied %s objects with %s errors', result['copied_count'], len(result['errors']))
+
+        return result
+
+    @tracked
     async def delete_object(self, bucket: str, key: str) -> dict:
         """
         Summary:
@@ -227,30 +1238,338 @@ class Boto3Client(BaseClient):
         """
         self.logger.info('Delete object %s/%s', bucket, key)
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            res = await s3.delete_object(Bucket=bucket, Key=key)
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(lambda: s3.delete_object(Bucket=bucket, Key=key))
+        self._invalidate_stat(bucket, key)
 
         return res
 
-    async def stat_object(self, bucket: str, key: str) -> dict:
+    async def _delete_batch(self, bucket: str, keys: List[str], versions: List[str] = None) -> List[dict]:
         """
         Summary:
-            The function is the boto3 wrapup to get the file metadata.
+            The function sends one DeleteObjects request in quiet mode, so only
+            the failed keys are returned by server. If the request fails as a
+            whole, every key in the batch will be reported with the error.
+
+        return:
+            - list: the errors of failed keys
+        """
+        objects = []
+        for i, key in enumerate(keys):
+            obj = {'Key': key}
+            if versions is not None and versions[i] is not None:
+                obj['VersionId'] = versions[i]
+            objects.append(obj)
+
+        s3 = await self._get_client()
+        try:
+            res = await self.transfer_controller.run(
+                lambda: s3.delete_objects(Bucket=bucket, Delete={'Objects': objects, 'Quiet': True})
+            )
+            errors = res.get('Errors', [])
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error('Fail to delete %s objects in %s: %s', len(keys), bucket, error_msg)
+            code = e.response.get('Error', {}).get('Code') if isinstance(e, ClientError) else type(e).__name__
+            errors = [dict(obj, Code=code, Message=error_msg) for obj in objects]
+
+        for key in keys:
+            self._invalidate_stat(bucket, key)
+
+        return errors
+
+    @tracked
+    async def delete_objects(
+        self,
+        bucket: str,
+        keys: List[str],
+        versions: List[str] = None,
+        concurrency: int = _DEFAULT_CONCURRENCY,
+    ) -> List[dict]:
+        """
+        Summary:
+            The function will delete the objects in batch. The keys are splitted
+            into chunks of 1000 keys, and each chunk is deleted by one DeleteObjects
+            request. The chunks are sent concurrently.
+
+        Parameter:
+            - bucket(str): the name of bucket
+            - keys(list of str): the keys of objects
+            - versions(list of str): the version id of each key, use None to
+                delete the latest version
+            - concurrency(int): the max number of requests sent at same time
+
+        return:
+            - list: the errors of failed keys, each one is a dict with
+                Key, VersionId, Code and Message
+        """
+        self.logger.info('Delete %s objects in %s', len(keys), bucket)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _delete_chunk(start: int) -> List[dict]:
+            end = start + _DELETE_BATCH_SIZE
+            chunk_versions = None if versions is None else versions[start:end]
+            async with semaphore:
+                return await self._delete_batch(bucket, keys[start:end], chunk_versions)
+
+        results = await asyncio.gather(*[_delete_chunk(start) for start in range(0, len(keys), _DELETE_BATCH_SIZE)])
+
+        return [error for errors in results for error in errors]
+
+    @tracked
+    async def delete_prefix(self, bucket: str, prefix: str, concurrency: int = _DEFAULT_CONCURRENCY) -> List[dict]:
+        """
+        Summary:
+            The function will delete all the objects under the prefix. The
+            listing is streamed and every 1000 keys are deleted by one request
+            while the listing continues. Note in versioned bucket, only the
+            delete markers will be created.
+
+        Parameter:
+            - bucket(str): the name of bucket
+            - prefix(str): the folder of objects, `/` is appended if missing
+            - concurrency(int): the max number of delete requests sent at same time
+
+        return:
+            - list: the errors of failed keys
+        """
+        # the prefix is the folder, eg. `del/dest` must not match `del/dest2/`
+        prefix = folder_prefix(prefix)
+        self.logger.info('Delete objects under %s/%s', bucket, prefix)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def _delete_chunk(keys: List[str]) -> List[dict]:
+            try:
+                return await self._delete_batch(bucket, keys)
+            finally:
+                semaphore.release()
+
+        try:
+            keys = []
+            async for obj in self.iter_objects(bucket, prefix):
+                keys.append(obj['Key'])
+                if len(keys) == _DELETE_BATCH_SIZE:
+                    await semaphore.acquire()
+                    tasks.append(asyncio.ensure_future(_delete_chunk(keys)))
+                    keys = []
+
+            if keys:
+                await semaphore.acquire()
+                tasks.append(asyncio.ensure_future(_delete_chunk(keys)))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        results = await asyncio.gather(*tasks)
+
+        return [error for errors in results for error in errors]
+
+    async def _paginate(self, operation: str, params: dict, input_token: str, output_token: str) -> AsyncIterator[dict]:
+        """
+        Summary:
+            The function yields the pages of operation, each page is retried
+            by transfer controller. The page iterator of botocore is finished
+            once it fails, so it is restarted from the token of last page.
+
+        Parameter:
+            - operation(str): the name of operation, eg. list_objects_v2
+            - params(dict): the parameters of operation
+            - input_token(str): the request parameter of next page token
+            - output_token(str): the response field of next page token
+        """
+        s3 = await self._get_client()
+        paginator = s3.get_paginator(operation)
+        pages = None
+        next_token = None
+
+        async def _next_page() -> dict:
+            nonlocal pages, next_token
+            if pages is None:
+                kwargs = dict(params)
+                if next_token is not None:
+                    kwargs['PaginationConfig'] = {'StartingToken': TokenEncoder().encode({input_token: next_token})}
+                pages = paginator.paginate(**kwargs).__aiter__()
+
+            try:
+                page = await pages.__anext__()
+            except StopAsyncIteration:
+                return None
+            except Exception:
+                pages = None
+                raise
+
+            next_token = page.get(output_token)
+            return page
+
+        while True:
+            page = await self.transfer_controller.run(_next_page)
+            if page is None:
+                return
+            yield page
+
+    async def _iter_pages(self, bucket: str, prefix: str, delimiter: str = None) -> AsyncIterator[dict]:
+        """
+        Summary:
+            The function yields the pages of `list_objects_v2`. The next page
+            is requested in background while the current one is consumed.
+        """
+        params = {'Bucket': bucket, 'Prefix': prefix}
+        if delimiter is not None:
+            params['Delimiter'] = delimiter
+
+        pages = self._paginate('list_objects_v2', params, 'ContinuationToken', 'NextContinuationToken').__aiter__()
+
+        async def _next_page() -> dict:
+            try:
+                return await pages.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        next_page = asyncio.ensure_future(_next_page())
+        try:
+            while True:
+                page = await next_page
+                if page is None:
+                    return
+                next_page = asyncio.ensure_future(_next_page())
+                yield page
+        finally:
+            next_page.cancel()
+
+    @tracked
+    async def iter_objects(
+        self,
+        bucket: str,
+        prefix: str = '',
+        delimiter: str = None,
+        fan_out: bool = False,
+        concurrency: int = _DEFAULT_CONCURRENCY,
+    ) -> AsyncIterator[dict]:
+        """
+        Summary:
+            The function is the async generator to list the objects under prefix.
+            The next page is prefetched while the caller handles current page.
+
+                async for obj in client.iter_objects(bucket, 'folder/'):
+                    print(obj['Key'], obj['Size'])
+
+            With `delimiter`, the common prefixes(eg. sub folders) are yielded as
+            well in the form of {'Prefix': <prefix>}.
+
+            With `fan_out`, the sub prefixes split by '/' are listed concurrently
+            and all the objects under prefix are yielded. Note the objects will
+            not be in lexical order in this mode.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - prefix(str): the prefix of objects
+            - delimiter(str): the character to group the keys
+            - fan_out(bool): list the sub prefixes concurrently
+            - concurrency(int): the max number of sub prefixes listed at same time
+
+        return:
+            - async iterator of dict: the object info with Key, Size, ETag and LastModified
+        """
+        self.logger.info('List objects under %s/%s', bucket, prefix)
+
+        if fan_out:
+            async for obj in self._iter_objects_fan_out(bucket, prefix, concurrency):
+                yield obj
+            return
+
+        async for page in self._iter_pages(bucket, prefix, delimiter):
+            for obj in page.get('Contents', []):
+                yield obj
+            for common_prefix in page.get('CommonPrefixes', []):
+                yield common_prefix
+
+    async def _iter_objects_fan_out(self, bucket: str, prefix: str, concurrency: int) -> AsyncIterator[dict]:
+        """
+        Summary:
+            The function lists the first level under prefix, and starts the
+            listing of each sub prefix concurrently. The objects of sub prefixes
+            are collected by a bounded queue. Each listing job puts None when it
+            finishes, or the error when it fails.
+        """
+        queue = asyncio.Queue(maxsize=_LIST_QUEUE_SIZE)
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def _list_prefix(sub_prefix: str) -> None:
+            try:
+                async with semaphore:
+                    async for obj in self.iter_objects(bucket, sub_prefix):
+                        await queue.put(obj)
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        try:
+            async for obj in self.iter_objects(bucket, prefix, delimiter='/'):
+                if 'Prefix' in obj:
+                    tasks.append(asyncio.ensure_future(_list_prefix(obj['Prefix'])))
+                else:
+                    yield obj
+
+            async for obj in _drain_queue(queue, len(tasks)):
+                yield obj
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @tracked
+    async def stat_object(self, bucket: str, key: str, version_id: str = None, use_cache: bool = True) -> dict:
+        """
+        Summary:
+            The function is the boto3 wrapup to get the file metadata. It
+            uses HEAD request so the object body will not be opened.
+
+            If the client is created with `stat_cache_ttl`, the result will
+            be cached in process by (bucket, key, version_id).
 
         Parameter:
             - bucket(str): the name of bucket
             - key(str): the key of source path
+            - version_id(str): the version of object, default is the latest one
+            - use_cache(bool): set False to bypass the cache
 
         return:
             - object meta: contains the version_id
         """
         self.logger.info('Stat object %s/%s', bucket, key)
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            res = await s3.get_object(Bucket=bucket, Key=key)
+        cache_key = (bucket, key, version_id)
+        if use_cache and self._stat_cache is not None:
+            res = self._stat_cache.get(cache_key)
+            if res is not None:
+                return dict(res)
+
+        params = {'Bucket': bucket, 'Key': key}
+        if version_id is not None:
+            params['VersionId'] = version_id
+
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(lambda: s3.head_object(**params))
+
+        if self._stat_cache is not None:
+            self._stat_cache.set(cache_key, dict(res))
 
         return res
 
+    def _invalidate_stat(self, bucket: str, key: str) -> None:
+        """
+        Summary:
+            The function will drop the cached metadata of latest object
+            after it is changed by current client.
+        """
+        if self._stat_cache is not None:
+            self._stat_cache.pop((bucket, key, None))
+
     async def get_download_presigned_url(self, bucket: str, key: str, duration: int = 3600) -> str:
         """
         Summary:
@@ -267,14 +1586,54 @@ class Boto3Client(BaseClient):
         """
         self.logger.info('Get download presigned url %s/%s', bucket, key)
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            presigned_url = await s3.generate_presigned_url(
-                'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=duration
-            )
+        s3 = await self._get_client()
+        presigned_url = await s3.generate_presigned_url(
+            'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=duration
+        )
 
         return presigned_url
 
-    async def prepare_multipart_upload(self, bucket: str, keys: List[str]) -> List[str]:
+    async def get_download_presigned_urls(self, bucket: str, keys: List[str], duration: int = 3600) -> Dict[str, str]:
+        """
+        Summary:
+            The function will generate the download presigned urls for a batch
+            of objects. The urls are signed locally with cached signing key, so
+            there is no network request or s3 client involved.
+
+            If the client is created with `presigned_url_cache_size`, the url
+            will be reused while more than half of its duration is left.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - keys(list of str): the object paths of files
+            - duration(int): how long the links will expire
+
+        return:
+            - dict: the presigned url of each key
+        """
+        self.logger.info('Get download presigned urls for %s objects in %s', len(keys), bucket)
+
+        presigned_urls = {}
+        for key in keys:
+            cache_key = (bucket, key, duration)
+            presigned_url = None
+            if self._presigned_url_cache is not None:
+                presigned_url = self._presigned_url_cache.get(cache_key)
+
+            if presigned_url is None:
+                presigned_url = self._presigner.presign('GET', bucket, key, duration)
+                if self._presigned_url_cache is not None:
+                    ttl = duration * _PRESIGNED_URL_REUSE_RATIO
+                    self._presigned_url_cache.set(cache_key, presigned_url, ttl=ttl)
+
+            presigned_urls[key] = presigned_url
+
+        return presigned_urls
+
+    @tracked
+    async def prepare_multipart_upload(
+        self, bucket: str, keys: List[str], concurrency: int = _DEFAULT_BATCH_CONCURRENCY, extra_args: dict = None
+    ) -> List[str]:
         """
         Summary:
             The function is the boto3 wrapup to generate a multipart upload presigned url.
@@ -283,65 +1642,174 @@ class Boto3Client(BaseClient):
             NOTE: The api has been changed to adapot the batch operation. The prepare
             upload api is a batch operation to create all jobs and lock in advance. If
             not, the performance will decrease that every iteration will try to connect
-            with endpoints
+            with endpoints. The uploads are created concurrently.
+
+            If some of the keys fail, the `MultipartUploadPreparationError` will be raised
+            after all the keys are processed. It contains the upload ids already created
+            and the error of each failed key.
 
         Parameter:
             - bucket(str): the bucket name
             - keys(list of str): the object path of file
+            - concurrency(int): the max number of uploads created at same time
+            - extra_args(dict): the extra parameters of `create_multipart_upload`,
+                eg. ContentType and Metadata
 
         return:
             - upload_id(list): list of upload id will be used in later two apis
         """
         self.logger.info('Prepare multipart upload for bucket: %s, keys: %s', bucket, str(keys))
 
+        s3 = await self._get_client()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _create_multipart_upload(key: str) -> str:
+            async with semaphore:
+                res = await self.transfer_controller.run(
+                    lambda: s3.create_multipart_upload(Bucket=bucket, Key=key, **(extra_args or {}))
+                )
+
+            return res.get('UploadId')
+
+        results = await asyncio.gather(*[_create_multipart_upload(key) for key in keys], return_exceptions=True)
+
         upload_id_list = []
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            for key in keys:
-                res = await s3.create_multipart_upload(Bucket=bucket, Key=key)
-                upload_id_list.append(res.get('UploadId'))
+        errors = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, BaseException):
+                errors[key] = result
+                upload_id_list.append(None)
+            else:
+                upload_id_list.append(result)
 
         self.logger.info('Result upload ids: %s', str(upload_id_list))
 
+        if errors:
+            error_msg = 'Fail to prepare multipart upload for %s keys: %s' % (len(errors), str(list(errors)))
+            self.logger.error(error_msg)
+            raise MultipartUploadPreparationError(error_msg, upload_id_list, errors)
+
         return upload_id_list
 
-    async def part_upload(self, bucket: str, key: str, upload_id: str, part_number: int, content: str) -> dict:
+    async def get_part_upload_presigned_urls(
+        self, bucket: str, key: str, upload_id: str, part_numbers: Iterable[int], duration: int = 3600
+    ) -> Dict[int, str]:
+        """
+        Summary:
+            The function will generate the presigned urls to upload the parts
+            of multipart upload. The urls are signed locally in one pass, so the
+            caller(eg. browser or cli) can upload the parts directly to object
+            storage in parallel. The ETag in response header of each part is
+            needed by `combine_chunks`.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+            - part_numbers(list of int): the part numbers to upload (which starts from 1)
+            - duration(int): how long the links will expire
+
+        return:
+            - dict: the presigned url of each part number
+        """
+        part_numbers = list(part_numbers)
+        self.logger.info('Get presigned urls of %s parts for upload id: %s', len(part_numbers), upload_id)
+
+        now = datetime.utcnow()
+        return {
+            part_number: self._presigner.presign(
+                'PUT',
+                bucket,
+                key,
+                duration,
+                query={'partNumber': str(part_number), 'uploadId': upload_id},
+                now=now,
+            )
+            for part_number in part_numbers
+        }
+
+    @tracked
+    async def part_upload(
+        self,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        content: PartContent,
+        content_length: int = None,
+        timeout: float = 60,
+    ) -> dict:
         """
         Summary:
             The function is the boto3 wrapup to upload a SINGLE part.
             This is the second step to do the multipart upload.
 
+            The content is sent without extra copy: the buffers(bytearray,
+            memoryview, mmap) are sent by memoryview slices, the `FileSegment`
+            is streamed from disk, and the async iterator is sent as it is.
+
+            The part is retried by `transfer_controller` on throttling and server
+            errors, except the async iterator which cannot be sent twice. The
+            content is sent under the bandwidth limit of client and process.
+
         Parameter:
             - bucket(str): the bucket name
             - key(str): the object path of file
             - upload_id(str): the hash id generate from `prepare_multipart_upload` function
             - part_number(int): the part number of current chunk (which starts from 1)
-            - content(str/byte): the file content
+            - content(str/bytes/bytearray/memoryview/mmap/FileSegment/async iterator):
+                the file content
+            - content_length(int): the size of content, it is required for async iterator
+            - timeout(float): the seconds to wait for the part
 
         return:
             - dict: will be collected and used in third step
         """
+        if content_length is None:
+            content_length = get_content_length(content)
+            if content_length is None:
+                raise ValueError('content_length is necessary for async iterator content')
+
         self.logger.info('Upload object %s/%s with upload id: %s', bucket, key, upload_id)
-        self.logger.info('Part number: %s with size: %s', part_number, len(content))
+        self.logger.info('Part number: %s with size: %s', part_number, content_length)
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            signed_url = await s3.generate_presigned_url(
-                ClientMethod='upload_part',
-                Params={'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
-            )
+        s3 = await self._get_client()
+        signed_url = await s3.generate_presigned_url(
+            ClientMethod='upload_part',
+            Params={'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+        )
+
+        client = self._get_http_client()
 
-        async with httpx.AsyncClient() as client:
+        async def _send_part() -> httpx.Response:
             self.logger.info('Send part to server')
-            res = await client.put(signed_url, data=content, timeout=60)
+            request_content = to_request_content(content)
+            if self.bandwidth_limiter.enabled:
+                request_content = self.bandwidth_limiter.limit_stream(request_content)
+
+            res = await client.put(
+                signed_url,
+                content=request_content,
+                headers={'Content-Length': str(content_length)},
+                timeout=timeout,
+            )
 
             if res.status_code != 200:
                 error_msg = 'Fail to upload the chunck %s: %s' % (part_number, str(res.text))
                 self.logger.error(error_msg)
-                raise Exception(error_msg)
+                raise PartUploadError(error_msg, res.status_code)
+
+            return res
 
+        # the async iterator can only be sent once
+        max_retries = None if get_content_length(content) is not None else 0
+        res = await self.transfer_controller.run(_send_part, max_retries=max_retries)
+        record_bytes(content_length)
         etag = res.headers.get('ETag').replace("\"", '')
 
         return {'ETag': etag, 'PartNumber': part_number}
 
+    @tracked
     async def combine_chunks(self, bucket: str, key: str, upload_id: str, parts: list) -> dict:
         """
         Summary:
@@ -361,9 +1829,601 @@ class Boto3Client(BaseClient):
         self.logger.info('Combine chunks %s/%s with upload id: %s', bucket, key, upload_id)
         self.logger.info('Number of chunks: %s', len(parts))
 
-        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
-            res = await s3.complete_multipart_upload(
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(
+            lambda: s3.complete_multipart_upload(
                 Bucket=bucket, Key=key, MultipartUpload={'Parts': parts}, UploadId=upload_id
             )
+        )
+        self._invalidate_stat(bucket, key)
 
         return res
+
+    @tracked
+    async def abort_multipart_upload(self, bucket: str, key: str, upload_id: str) -> dict:
+        """
+        Summary:
+            The function is the boto3 wrapup to abort the multipart upload.
+            The uploaded parts will be removed on server side.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+
+        return:
+            - dict
+        """
+        self.logger.info('Abort multipart upload %s/%s with upload id: %s', bucket, key, upload_id)
+
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(
+            lambda: s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        )
+
+        return res
+
+    async def _abort_silently(self, bucket: str, key: str, upload_id: str) -> None:
+        """
+        Summary:
+            The function aborts the multipart upload during error handling, the
+            error of abort itself is logged so it won't hide the original one.
+        """
+        try:
+            await self.abort_multipart_upload(bucket, key, upload_id)
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error('Fail to abort the upload %s: %s', upload_id, error_msg)
+
+    @tracked
+    async def list_parts(self, bucket: str, key: str, upload_id: str) -> List[dict]:
+        """
+        Summary:
+            The function is the boto3 wrapup to list the parts already stored
+            on server for the multipart upload.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+
+        return:
+            - list: the dict of PartNumber, ETag and Size of each part
+        """
+        self.logger.info('List parts of %s/%s with upload id: %s', bucket, key, upload_id)
+
+        params = {'Bucket': bucket, 'Key': key, 'UploadId': upload_id}
+        parts = []
+        async for page in self._paginate('list_parts', params, 'PartNumberMarker', 'NextPartNumberMarker'):
+            parts.extend(page.get('Parts', []))
+
+        return parts
+
+    async def _resume_from_checkpoint(self, checkpoint: UploadCheckpoint) -> Dict[int, dict]:
+        """
+        Summary:
+            The function finds the parts of the checkpoint upload which are
+            already stored on server with the expected size. None will be
+            returned if the upload doesn't exist anymore.
+
+        return:
+            - dict: the part of each finished part number
+        """
+        try:
+            stored_parts = await self.list_parts(checkpoint.bucket, checkpoint.key, checkpoint.upload_id)
+        except ClientError as e:
+            error_msg = str(e)
+            self.logger.info('Cannot resume the upload %s: %s', checkpoint.upload_id, error_msg)
+            return None
+
+        finished_parts = {}
+        for part in stored_parts:
+            part_number = part['PartNumber']
+            offset = (part_number - 1) * checkpoint.part_size
+            if part.get('Size') == min(checkpoint.part_size, checkpoint.file_size - offset):
+                finished_parts[part_number] = {'ETag': part['ETag'].replace('"', ''), 'PartNumber': part_number}
+
+        return finished_parts
+
+    async def _start_multipart_upload(
+        self, bucket: str, key: str, local_path: str, part_size: int, checkpoint_path: str
+    ) -> Tuple[str, int, Dict[int, dict], UploadCheckpoint]:
+        """
+        Summary:
+            The function resumes the upload recorded in checkpoint if it matches
+            the local file, otherwise creates a new multipart upload.
+
+        return:
+            - tuple: the upload id, part size, finished parts and checkpoint
+        """
+        file_size = os.path.getsize(local_path)
+        mtime = os.path.getmtime(local_path)
+        extra_args = {'Metadata': {_PART_SIZE_METADATA: str(part_size)}}
+
+        if checkpoint_path is None:
+            upload_id = (await self.prepare_multipart_upload(bucket, [key], extra_args=extra_args))[0]
+            return upload_id, part_size, {}, None
+
+        loop = asyncio.get_running_loop()
+        checkpoint = await loop.run_in_executor(None, UploadCheckpoint.load, checkpoint_path)
+        if checkpoint is not None and checkpoint.matches(bucket, key, local_path, file_size, mtime):
+            finished_parts = await self._resume_from_checkpoint(checkpoint)
+            if finished_parts is not None:
+                self.logger.info('Resume upload %s with %s finished parts', checkpoint.upload_id, len(finished_parts))
+                checkpoint.parts = {part_number: part['ETag'] for part_number, part in finished_parts.items()}
+                return checkpoint.upload_id, checkpoint.part_size, finished_parts, checkpoint
+
+        upload_id = (await self.prepare_multipart_upload(bucket, [key], extra_args=extra_args))[0]
+        checkpoint = UploadCheckpoint(checkpoint_path, bucket, key, local_path, upload_id, part_size, file_size, mtime)
+        await loop.run_in_executor(None, checkpoint.save)
+
+        return upload_id, part_size, {}, checkpoint
+
+    async def _stat_unchanged_object(self, bucket: str, key: str, local_path: str) -> dict:
+        """
+        Summary:
+            The function returns the metadata of object if it has the same size
+            and ETag as local file, otherwise returns None. The ETag is computed
+            with the part size recorded in object metadata, or the part sizes
+            giving the same number of parts. The part size of current upload is
+            not used since the policy may choose a different one.
+        """
+        try:
+            meta = await self.stat_object(bucket, key, use_cache=False)
+        except ClientError as e:
+            if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 404:
+                return None
+            raise
+
+        if meta.get('ContentLength') != os.path.getsize(local_path):
+            return None
+
+        stored_part_size = meta.get('Metadata', {}).get(_PART_SIZE_METADATA, '')
+        part_size = int(stored_part_size) if stored_part_size.isdigit() else None
+
+        if not await etag_matches(local_path, meta.get('ETag', ''), part_size):
+            return None
+
+        return meta
+
+    @tracked
+    async def upload_file(
+        self,
+        bucket: str,
+        key: str,
+        local_path: str,
+        part_size: int = None,
+        concurrency: int = None,
+        checkpoint_path: str = None,
+        skip_if_unchanged: bool = False,
+    ) -> dict:
+        """
+        Summary:
+            The function will upload the local file with multipart upload. The
+            file will be splitted into parts, and the parts will be streamed from
+            disk and uploaded in parallel. The number of parts in flight is bounded
+            by `concurrency`. If any part fails, the multipart upload
+            will be aborted.
+
+            With `checkpoint_path`, the upload becomes resumable. The upload id,
+            part size and uploaded parts are recorded in the checkpoint file, and
+            the failed upload is kept on server. Calling the function again with
+            same checkpoint will only upload the parts missing on server. The
+            checkpoint file is removed once the upload is finished.
+
+            With `skip_if_unchanged`, the ETag of local file is computed and compared
+            with the existing object(by HEAD). The upload is skipped if they match.
+
+            By default, the part size, concurrency and part timeout are chosen by
+            `part_size_policy` from the file size and the throughput measured on
+            earlier parts. The part size is fixed within one upload.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - local_path(str): the local path of file to upload
+            - part_size(int): the size of each part in bytes, default is chosen by
+                policy. Note all parts except the last one must be at least 5MB,
+                and it is raised if the file needs more than 10000 parts. The part
+                size in checkpoint is used when the upload is resumed
+            - concurrency(int): the max number of parts uploaded at same time,
+                default is chosen by policy
+            - checkpoint_path(str): the local path of checkpoint file
+            - skip_if_unchanged(bool): skip the upload if object has same content
+
+        return:
+            - dict: the result of `combine_chunks`, or the object meta if skipped
+        """
+        policy = self.part_size_policy
+        file_size = os.path.getsize(local_path)
+        part_size = policy.choose_part_size(file_size, part_size)
+
+        if skip_if_unchanged:
+            meta = await self._stat_unchanged_object(bucket, key, local_path)
+            if meta is not None:
+                self.logger.info('Skip the upload of unchanged file %s to %s/%s', local_path, bucket, key)
+                return meta
+
+        upload_id, part_size, finished_parts, checkpoint = await self._start_multipart_upload(
+            bucket, key, local_path, part_size, checkpoint_path
+        )
+
+        part_count = max(1, math.ceil(file_size / part_size))
+        pending_parts = [part_number for part_number in range(1, part_count + 1) if part_number not in finished_parts]
+        if concurrency is None:
+            concurrency = policy.choose_concurrency(len(pending_parts))
+        self.logger.info(
+            'Upload file %s to %s/%s in %s parts of %s bytes with concurrency %s',
+            local_path,
+            bucket,
+            key,
+            part_count,
+            part_size,
+            concurrency,
+        )
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        start_time = time.monotonic()
+
+        async def _upload_part(part_number: int) -> dict:
+            offset = (part_number - 1) * part_size
+            segment = FileSegment(local_path, offset, min(part_size, file_size - offset))
+            async with semaphore:
+                part_start_time = time.monotonic()
+                part = await self.part_upload(
+                    bucket, key, upload_id, part_number, segment, timeout=policy.part_timeout(segment.length)
+                )
+                policy.record_part(segment.length, time.monotonic() - part_start_time)
+
+            if checkpoint is not None:
+                checkpoint.parts[part_number] = part['ETag']
+                await loop.run_in_executor(None, checkpoint.save)
+
+            return part
+
+        try:
+            parts = await _gather_or_cancel(_upload_part(part_number) for part_number in pending_parts)
+        except BaseException:
+            if checkpoint is None:
+                self.logger.error('Fail to upload file %s, abort the upload %s', local_path, upload_id)
+                await self._abort_silently(bucket, key, upload_id)
+            else:
+                self.logger.error('Fail to upload file %s, keep the upload %s to resume', local_path, upload_id)
+            raise
+
+        uploaded_size = sum(min(part_size, file_size - (part_number - 1) * part_size) for part_number in pending_parts)
+        policy.record_transfer(uploaded_size, time.monotonic() - start_time, concurrency)
+
+        parts = sorted(list(finished_parts.values()) + parts, key=lambda part: part['PartNumber'])
+        res = await self.combine_chunks(bucket, key, upload_id, parts)
+
+        if checkpoint is not None:
+            await loop.run_in_executor(None, checkpoint.remove)
+
+        return res
+
+    @tracked
+    async def put_object(self, bucket: str, key: str, local_path: str) -> dict:
+        """
+        Summary:
+            The function uploads the small file with a single PUT request, which
+            saves two round trips of multipart upload. The file is loaded into
+            memory, so it should be used for small files only.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - local_path(str): the local path of file to upload
+
+        return:
+            - dict: the response of `put_object` with ETag
+        """
+        self.logger.info('Put object %s/%s from %s', bucket, key, local_path)
+
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(None, _read_file, local_path)
+        if self.bandwidth_limiter.enabled:
+            await self.bandwidth_limiter.consume(len(content))
+
+        s3 = await self._get_client()
+        res = await self.transfer_controller.run(lambda: s3.put_object(Bucket=bucket, Key=key, Body=content))
+        self._invalidate_stat(bucket, key)
+        record_bytes(len(content))
+
+        return res
+
+    async def _upload_one(self, bucket: str, key: str, local_path: str, multipart_threshold: int) -> dict:
+        # the small file is sent by single put, the large one by multipart upload
+        if os.path.getsize(local_path) < multipart_threshold:
+            return await self.put_object(bucket, key, local_path)
+
+        return await self.upload_file(bucket, key, local_path)
+
+    @tracked
+    async def upload_objects(
+        self,
+        bucket: str,
+        items: Iterable[Tuple[str, str]],
+        concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+        multipart_threshold: int = _SMALL_OBJECT_THRESHOLD,
+        progress_callback: Callable[[dict], None] = None,
+    ) -> dict:
+        """
+        Summary:
+            The function uploads a batch of local files. The files smaller than
+            `multipart_threshold` are sent by single `put_object` calls, and the
+            larger ones by multipart upload(see `upload_file`). The files are
+            uploaded by a pool of workers on the shared connection pool, so the
+            folder with thousands of tiny files doesn't pay three round trips
+            per file.
+
+            The failed file will not stop the batch, the error is collected in
+            the result instead.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - items(list of tuple): the (key, local_path) of each file
+            - concurrency(int): the max number of files uploaded at same time. Note
+                the requests are also bounded by `max_pool_connections`
+            - multipart_threshold(int): the file size to switch to multipart upload
+            - progress_callback(callable): the function(or coroutine function) called
+                after each file with dict of key, local_path, size, error,
+                uploaded_count and uploaded_bytes
+
+        return:
+            - dict: the uploaded_count, uploaded_bytes, the ETag of each uploaded key
+                and the errors of failed keys
+        """
+        self.logger.info('Upload objects to %s with concurrency %s', bucket, concurrency)
+
+        result = {'uploaded_count': 0, 'uploaded_bytes': 0, 'etags': {}, 'errors': {}}
+
+        async def _items() -> AsyncIterator[Tuple[str, str]]:
+            for item in items:
+                yield item
+
+        async def _upload(item: Tuple[str, str]) -> None:
+            key, local_path = item
+            size = 0
+            error_msg = None
+            try:
+                size = os.path.getsize(local_path)
+                res = await self._upload_one(bucket, key, local_path, multipart_threshold)
+                result['etags'][key] = res.get('ETag', '').replace('"', '')
+                result['uploaded_count'] += 1
+                result['uploaded_bytes'] += size
+            except Exception as e:
+                error_msg = str(e)
+                self.logger.error('Fail to upload %s to %s/%s: %s', local_path, bucket, key, error_msg)
+                result['errors'][key] = error_msg
+
+            progress = {
+                'key': key,
+                'local_path': local_path,
+                'size': size,
+                'error': error_msg,
+                'uploaded_count': result['uploaded_count'],
+                'uploaded_bytes': result['uploaded_bytes'],
+            }
+            await _report_progress(progress_callback, progress)
+
+        await _run_concurrently(_items(), _upload, concurrency)
+
+        self.logger.info('Uploaded %s objects with %s errors', result['uploaded_count'], len(result['errors']))
+
+        return result
+
+    async def _download_for_sync(self, bucket: str, key: str, local_path: str, size: int) -> None:
+        # the large object is downloaded by ranges pinned to its ETag
+        if size > _DEFAULT_PART_SIZE:
+            await self.download_object_in_parts(bucket, key, local_path)
+        else:
+            await self.download_object(bucket, key, local_path)
+
+    @tracked
+    async def sync_down(
+        self,
+        bucket: str,
+        prefix: str,
+        local_dir: str,
+        concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+        manifest_path: str = None,
+        delete: bool = False,
+    ) -> dict:
+        """
+        Summary:
+            The function mirrors the objects under prefix into local directory.
+            The object is skipped if its size and ETag are same as the manifest
+            of last sync, and the local file still has the size and mtime in
+            manifest. Only the changed objects are downloaded concurrently, so
+            re-syncing a large dataset only costs the listing and local stats.
+
+            The failed object will not stop the sync, the error is collected in
+            the result instead. The manifest is saved even if the sync fails.
+
+        Parameter:
+            - bucket(str): the bucket name
+            - prefix(str): the folder of objects, `/` is appended if missing
+            - local_dir(str): the local directory to download into
+            - concurrency(int): the max number of objects downloaded at same time
+            - manifest_path(str): the path of manifest, default is `.sync_manifest.json`
+                under local directory
+            - delete(bool): remove the local files synced before but no longer on server
+
+        return:
+            - dict: the transferred_count, transferred_bytes, skipped_count, deleted_count
+                and the errors of failed keys
+        """
+        self.logger.info('Sync %s/%s down to %s', bucket, prefix, local_dir)
+
+        prefix = folder_prefix(prefix)
+        loop = asyncio.get_running_loop()
+        manifest_path = manifest_path or os.path.join(local_dir, SYNC_MANIFEST_NAME)
+        manifest = await loop.run_in_executor(None, SyncManifest.load, manifest_path, bucket, prefix)
+        result = {'transferred_count': 0, 'transferred_bytes': 0, 'skipped_count': 0, 'deleted_count': 0, 'errors': {}}
+        remote_paths = set()
+
+        async def _changed_objects() -> AsyncIterator[Tuple[str, dict]]:
+            async for obj in self.iter_objects(bucket, prefix):
+                relative_path = relative_key(obj['Key'], prefix)
+                if relative_path is None:
+                    continue
+
+                remote_paths.add(relative_path)
+                etag = obj.get('ETag', '').replace('"', '')
+                local_path = local_path_of(local_dir, relative_path)
+                if manifest.is_unchanged(relative_path, obj.get('Size', 0), etag=etag) and _is_local_file_unchanged(
+                    local_path, manifest.entries[relative_path]
+                ):
+                    result['skipped_count'] += 1
+                    continue
+
+                yield relative_path, obj
+
+        async def _download(item: Tuple[str, dict]) -> None:
+            relative_path, obj = item
+            local_path = local_path_of(local_dir, relative_path)
+            try:
+                await self._download_for_sync(bucket, obj['Key'], local_path, obj.get('Size', 0))
+            except Exception as e:
+                error_msg = str(e)
+                self.logger.error('Fail to sync %s/%s: %s', bucket, obj['Key'], error_msg)
+                result['errors'][obj['Key']] = error_msg
+                return
+
+            stat = os.stat(local_path)
+            manifest.set(relative_path, stat.st_size, stat.st_mtime, obj.get('ETag', '').replace('"', ''))
+            result['transferred_count'] += 1
+            result['transferred_bytes'] += stat.st_size
+
+        try:
+            await _run_concurrently(_changed_objects(), _download, concurrency)
+
+            if delete:
+                result['deleted_count'] = _delete_local_for_sync(
+                    local_dir, manifest, set(manifest.entries) - remote_paths
+                )
+        finally:
+            await loop.run_in_executor(None, manifest.save)
+
+        self.logger.info(
+            'Synced %s objects down, skipped %s with %s errors',
+            result['transferred_count'],
+            result['skipped_count'],
+            len(result['errors']),
+        )
+
+        return result
+
+    async def _list_remote_etags(self, bucket: str, prefix: str) -> Dict[str, str]:
+        prefix = folder_prefix(prefix)
+        remote_etags = {}
+        async for obj in self.iter_objects(bucket, prefix):
+            relative_path = relative_key(obj['Key'], prefix)
+            if relative_path is not None:
+                remote_etags[relative_path] = obj.get('ETag', '').replace('"', '')
+
+        return remote_etags
+
+    async def _delete_for_sync(self, bucket: str, prefix: str, manifest: SyncManifest, relative_paths: set) -> int:
+        keys = [join_key(prefix, relative_path) for relative_path in relative_paths]
+        errors = await self.delete_objects(bucket, keys) if keys else []
+        failed_keys = {error.get('Key') for error in errors}
+
+        deleted_count = 0
+        for relative_path, key in zip(relative_paths, keys):
+            if key not in failed_keys:
+                manifest.pop(relative_path)
+                deleted_count += 1
+
+        return deleted_count
+
+    @tracked
+    async def sync_up(
+        self,
+        local_dir: str,
+        bucket: str,
+        prefix: str,
+        concurrency: int = _DEFAULT_BATCH_CONCURRENCY,
+        manifest_path: str = None,
+        delete: bool = False,
+    ) -> dict:
+        """
+        Summary:
+            The function mirrors the local directory to the objects under prefix.
+            The file is skipped if its size and mtime are same as the manifest of
+            last sync, and the object still has the ETag in manifest. Only the
+            changed files are uploaded concurrently, the small files are sent by
+            single `put_object`(see `upload_objects`).
+
+            The failed file will not stop the sync, the error is collected in the
+            result instead. The manifest is saved even if the sync fails.
+
+        Parameter:
+            - local_dir(str): the local directory to upload
+            - bucket(str): the bucket name
+            - prefix(str): the folder of objects, `/` is appended if missing
+            - concurrency(int): the max number of files uploaded at same time
+            - manifest_path(str): the path of manifest, default is `.sync_manifest.json`
+                under local directory. The manifest file itself is never uploaded
+            - delete(bool): delete the objects synced before but removed locally.
+                The objects not created by sync are never deleted
+
+        return:
+            - dict: the transferred_count, transferred_bytes, skipped_count, deleted_count
+                and the errors of failed files
+        """
+        self.logger.info('Sync %s up to %s/%s', local_dir, bucket, prefix)
+
+        prefix = folder_prefix(prefix)
+        loop = asyncio.get_running_loop()
+        manifest_path = manifest_path or os.path.join(local_dir, SYNC_MANIFEST_NAME)
+        manifest = await loop.run_in_executor(None, SyncManifest.load, manifest_path, bucket, prefix)
+        local_files = await loop.run_in_executor(None, walk_local_files, local_dir, manifest_path)
+        remote_etags = await self._list_remote_etags(bucket, prefix)
+        result = {'transferred_count': 0, 'transferred_bytes': 0, 'skipped_count': 0, 'deleted_count': 0, 'errors': {}}
+
+        async def _changed_files() -> AsyncIterator[Tuple[str, int, float]]:
+            for relative_path, size, mtime in local_files:
+                etag = remote_etags.get(relative_path)
+                if etag is not None and manifest.is_unchanged(relative_path, size, mtime, etag):
+                    result['skipped_count'] += 1
+                    continue
+
+                yield relative_path, size, mtime
+
+        async def _upload(item: Tuple[str, int, float]) -> None:
+            relative_path, size, mtime = item
+            local_path = local_path_of(local_dir, relative_path)
+            try:
+                res = await self._upload_one(
+                    bucket, join_key(prefix, relative_path), local_path, _SMALL_OBJECT_THRESHOLD
+                )
+            except Exception as e:
+                error_msg = str(e)
+                self.logger.error('Fail to sync %s: %s', local_path, error_msg)
+                result['errors'][local_path] = error_msg
+                return
+
+            manifest.set(relative_path, size, mtime, res.get('ETag', '').replace('"', ''))
+            result['transferred_count'] += 1
+            result['transferred_bytes'] += size
+
+        try:
+            await _run_concurrently(_changed_files(), _upload, concurrency)
+
+            if delete:
+                removed_paths = set(manifest.entries) - {relative_path for relative_path, _, _ in local_files}
+                result['deleted_count'] = await self._delete_for_sync(bucket, prefix, manifest, removed_paths)
+        finally:
+            await loop.run_in_executor(None, manifest.save)
+
+        self.logger.info(
+            'Synced %s files up, skipped %s with %s errors',
+            result['transferred_count'],
+            result['skipped_count'],
+            len(result['errors']),
+        )
+
+        return result
@@ -0,0 +1,152 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import hashlib
+import math
+import os
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+_READ_BLOCK_SIZE = 8 * 1024 * 1024
+_MiB = 1024 * 1024
+# bound the hashing when the part size of ETag has to be guessed
+_MAX_GUESSED_PART_SIZES = 64
+
+
+def _md5_of_range(local_path: str, offset: int, length: int) -> bytes:
+    md5 = hashlib.md5()
+    with open(local_path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            block = f.read(min(_READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            md5.update(block)
+            length -= len(block)
+
+    return md5.digest()
+
+
+async def compute_etag(local_path: str, part_size: int = None, executor: Executor = None) -> str:
+    """
+    Summary:
+        The function computes the ETag that object storage will give to the
+        local file after upload. Without part size, it is the md5 of file(single
+        put). With part size, it is the multipart ETag: the md5 of all part md5
+        digests followed by `-<number of parts>`.
+
+        The parts are hashed in a thread pool(hashlib releases the GIL), so
+        the large file is hashed in parallel.
+
+    Parameter:
+        - local_path(str): the local path of file
+        - part_size(int): the size of each part of multipart upload
+        - executor(Executor): the pool to hash the parts, by default a thread pool
+            is created for the call
+
+    return:
+        - str: the ETag without quotes
+    """
+    file_size = os.path.getsize(local_path)
+    loop = asyncio.get_running_loop()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor()
+
+    try:
+        if part_size is None:
+            digest = await loop.run_in_executor(executor, _md5_of_range, local_path, 0, file_size)
+            return digest.hex()
+
+        part_count = _count_parts(file_size, part_size)
+        digests = await asyncio.gather(
+            *[
+                loop.run_in_executor(executor, _md5_of_range, local_path, part_number * part_size, part_size)
+                for part_number in range(part_count)
+            ]
+        )
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+    return '%s-%s' % (hashlib.md5(b''.join(digests)).hexdigest(), part_count)
+
+
+def _count_parts(file_size: int, part_size: int) -> int:
+    return max(1, math.ceil(file_size / part_size))
+
+
+def _guess_part_sizes(file_size: int, part_count: int) -> Iterator[int]:
+    """
+    Summary:
+        The function yields the part sizes in MiB(as most clients use) which
+        split the file into `part_count` parts, from the smallest one.
+    """
+    part_size = max(_MiB, math.ceil(file_size / part_count / _MiB) * _MiB)
+    for _ in range(_MAX_GUESSED_PART_SIZES):
+        if _count_parts(file_size, part_size) != part_count:
+            return
+        yield part_size
+        # all the part sizes not smaller than file give the same single part
+        if part_count == 1:
+            return
+        part_size += _MiB
+
+
+async def etag_matches(local_path: str, etag: str, part_size: int = None, executor: Executor = None) -> bool:
+    """
+    Summary:
+        The function checks if the local file has the same content as the
+        object with the ETag. For the multipart ETag, the part size is taken
+        from parameter if the number of parts matches. Otherwise, every part
+        size in MiB giving the same number of parts is tried, since the part
+        size cannot be derived from the ETag(eg. 12MiB in parts of 5MiB).
+
+        Note the ETag of encrypted object is not md5, so it will never match.
+
+    Parameter:
+        - local_path(str): the local path of file
+        - etag(str): the ETag of object
+        - part_size(int): the part size used to upload the object, if known
+        - executor(Executor): the pool to hash the parts
+
+    return:
+        - bool
+    """
+    etag = etag.replace('"', '')
+    if '-' not in etag:
+        return await compute_etag(local_path, executor=executor) == etag
+
+    part_count = int(etag.rsplit('-', 1)[1])
+    file_size = os.path.getsize(local_path)
+    if part_size and _count_parts(file_size, part_size) == part_count:
+        return await compute_etag(local_path, part_size, executor=executor) == etag
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor()
+
+    try:
+        for guessed_part_size in _guess_part_sizes(file_size, part_count):
+            if await compute_etag(local_path, guessed_part_size, executor=executor) == etag:
+                return True
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+    return False
@@ -0,0 +1,288 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+from typing import Iterable
+from typing import Tuple
+
+# the upper bounds of latency buckets in seconds
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class MetricsRecorder:
+    """
+    Summary:
+        The interface of metrics hook. The default implementation drops
+        everything, the subclass can forward the metrics to Prometheus,
+        OpenTelemetry or any other backend.
+    """
+
+    def record_operation(self, client: str, operation: str, seconds: float, bytes_count: int, error: bool) -> None:
+        """
+        Summary:
+            The function is called when an operation of client is finished.
+
+        Parameter:
+            - client(str): the name of client, eg. Boto3Client
+            - operation(str): the name of operation, eg. upload_file
+            - seconds(float): the latency of operation
+            - bytes_count(int): the bytes moved by operation
+            - error(bool): if the operation raised an error
+        """
+
+    def record_pool_wait(self, client: str, seconds: float) -> None:
+        """
+        Summary:
+            The function is called when a request got the slot to be sent
+            under the concurrency limit of `TransferController`, with the time
+            it waited. Only the requests sent through the controller(eg. all
+            the s3 calls of Boto3Client) are measured. The wait inside the
+            connection pool of botocore or httpx is not visible here.
+
+        Parameter:
+            - client(str): the name of client
+            - seconds(float): the waiting time
+        """
+
+
+class Histogram:
+    """
+    Summary:
+        The fixed bucket histogram with the same layout as Prometheus, the
+        count of each bucket is cumulative in snapshot.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = []
+        for upper_bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            buckets.append((upper_bound, cumulative))
+
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class _OperationStats:
+    def __init__(self, buckets: Tuple[float]) -> None:
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram(buckets)
+
+
+class InMemoryMetricsRecorder(MetricsRecorder):
+    """
+    Summary:
+        The recorder keeps the metrics of each (client, operation) in process.
+        The `snapshot` can be exported periodically, eg. by a Prometheus
+        collector or an OpenTelemetry observable callback.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """
+        Parameter:
+            - buckets(list of float): the upper bounds of latency buckets in seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._operations = {}
+        self._pool_waits = {}
+        self._lock = threading.Lock()
+
+    def record_operation(self, client: str, operation: str, seconds: float, bytes_count: int, error: bool) -> None:
+        with self._lock:
+            stats = self._operations.get((client, operation))
+            if stats is None:
+                stats = self._operations[(client, operation)] = _OperationStats(self.buckets)
+
+            stats.count += 1
+            stats.errors += int(error)
+            stats.bytes += bytes_count
+            stats.latency.observe(seconds)
+
+    def record_pool_wait(self, client: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._pool_waits.get(client)
+            if histogram is None:
+                histogram = self._pool_waits[client] = Histogram(self.buckets)
+
+            histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Summary:
+            The function returns a copy of all the metrics. The throughput is
+            the bytes moved per second of operation time.
+
+        return:
+            - dict: with `operations` and `pool_wait` list
+        """
+        with self._lock:
+            operations = [
+                {
+                    'client': client,
+                    'operation': operation,
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'bytes': stats.bytes,
+                    'throughput': stats.bytes / stats.latency.sum if stats.latency.sum > 0 else 0,
+                    'latency': stats.latency.snapshot(),
+                }
+                for (client, operation), stats in self._operations.items()
+            ]
+            pool_wait = [
+                {'client': client, 'latency': histogram.snapshot()} for client, histogram in self._pool_waits.items()
+            ]
+
+        return {'operations': operations, 'pool_wait': pool_wait}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations = {}
+            self._pool_waits = {}
+
+
+_recorder = InMemoryMetricsRecorder()
+_current_timer = ContextVar('_current_timer', default=None)
+
+
+def get_metrics_recorder() -> MetricsRecorder:
+    """
+    Summary:
+        The function returns the process-wide recorder used by the clients
+        without their own `metrics`.
+    """
+    return _recorder
+
+
+def set_metrics_recorder(recorder: MetricsRecorder) -> None:
+    """
+    Summary:
+        The function replaces the process-wide recorder, eg. with the one
+        exporting to Prometheus.
+    """
+    global _recorder
+    _recorder = recorder
+
+
+class OperationTimer:
+    """
+    Summary:
+        The context manager to measure one operation. The bytes reported by
+        nested operations(eg. `part_upload` inside `upload_file`) are also
+        added to the outer one.
+    """
+
+    def __init__(self, recorder: MetricsRecorder, client: str, operation: str, bind: bool = True) -> None:
+        """
+        Parameter:
+            - recorder(MetricsRecorder): the recorder to report
+            - client(str): the name of client
+            - operation(str): the name of operation
+            - bind(bool): make the timer current for `record_bytes`, it must be
+                False in async generator since the context is shared with caller
+        """
+        self.recorder = recorder
+        self.client = client
+        self.operation = operation
+        self.bind = bind
+        self.bytes = 0
+
+        self._parent = None
+        self._token = None
+        self._start = None
+
+    def add_bytes(self, bytes_count: int) -> None:
+        self.bytes += bytes_count
+        if self._parent is not None:
+            self._parent.add_bytes(bytes_count)
+
+    def __enter__(self) -> 'OperationTimer':
+        self._parent = _current_timer.get()
+        if self.bind:
+            self._token = _current_timer.set(self)
+        self._start = time.monotonic()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        seconds = time.monotonic() - self._start
+        if self._token is not None:
+            _current_timer.reset(self._token)
+
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        self.recorder.record_operation(self.client, self.operation, seconds, self.bytes, error)
+
+
+def record_bytes(bytes_count: int) -> None:
+    """
+    Summary:
+        The function adds the bytes to the operation currently measured.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_bytes(bytes_count)
+
+
+def _get_recorder(client: object) -> MetricsRecorder:
+    return getattr(client, 'metrics', None) or get_metrics_recorder()
+
+
+def tracked(func: Callable) -> Callable:
+    """
+    Summary:
+        The decorator to measure the async method of client as an operation
+        named by the method. The client needs `client_name`, and `metrics` to
+        use its own recorder. For async generator, the bytes of yielded chunks
+        are counted.
+    """
+    if inspect.isasyncgenfunction(func):
+
+        @functools.wraps(func)
+        async def _generator_wrapper(self, *args, **kwargs):
+            generator = func(self, *args, **kwargs)
+            with OperationTimer(_get_recorder(self), self.client_name, func.__name__, bind=False) as timer:
+                try:
+                    async for item in generator:
+                        if isinstance(item, (bytes, bytearray, memoryview)):
+                            timer.add_bytes(len(item))
+                        yield item
+                finally:
+                    await generator.aclose()
+
+        return _generator_wrapper
+
+    @functools.wraps(func)
+    async def _wrapper(self, *args, **kwargs):
+        with OperationTimer(_get_recorder(self), self.client_name, func.__name__):
+            return await func(self, *args, **kwargs)
+
+    return _wrapper
@@ -21,6 +21,7 @@ from minio.helpers import url_replace
 from minio.signer import sign_v4_s3
 
 from common.object_storage_adaptor.base_client import BaseClient
+from common.object_storage_adaptor.metrics import tracked
 
 
 class PolicyDoesNotExist(Exception):
@@ -45,6 +46,7 @@ class MinioPolicyClient(Minio):
         Keeping the binary in common package is not a good idea. Thus, We
         setup the logic by our own.
     """
+
     client_name = 'MinioPolicyClient'
     base_client = BaseClient(client_name)
 
@@ -52,7 +54,10 @@ class MinioPolicyClient(Minio):
     logger = base_client.logger
     debug_on = base_client.debug_on
     debug_off = base_client.debug_off
+    # the recorder of metrics, default is the process-wide one
+    metrics = None
 
+    @tracked
     async def create_IAM_policy(self, policy_name: str, content: str, region: str = 'us-east-1'):
         """
         Summary:
@@ -102,6 +107,7 @@ class MinioPolicyClient(Minio):
 
         return 'success'
 
+    @tracked
     async def get_IAM_policy(self, policy_name: str, region: str = 'us-east-1'):
         """
         Summary:
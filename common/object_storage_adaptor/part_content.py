@@ -0,0 +1,107 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import mmap
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import NamedTuple
+from typing import Union
+
+# the size of each chunk sent to the socket
+_SEND_CHUNK_SIZE = 1024 * 1024
+
+
+class FileSegment(NamedTuple):
+    """
+    Summary:
+        The byte range of local file to upload. The segment is read from
+        disk chunk by chunk while it is sent, so it is never loaded into
+        memory as a whole.
+    """
+
+    path: str
+    offset: int
+    length: int
+
+
+PartContent = Union[str, bytes, bytearray, memoryview, mmap.mmap, FileSegment, AsyncIterable[bytes]]
+
+
+def get_content_length(content: PartContent) -> int:
+    """
+    Summary:
+        The function returns the size of content in bytes. None will be
+        returned for async iterator since its size is unknown.
+
+    Parameter:
+        - content(PartContent): the content to upload
+
+    return:
+        - int
+    """
+    if isinstance(content, FileSegment):
+        return content.length
+    elif isinstance(content, str):
+        return len(content.encode())
+    elif isinstance(content, (bytes, bytearray, memoryview, mmap.mmap)):
+        return memoryview(content).nbytes
+
+    return None
+
+
+async def _iter_buffer(buffer: memoryview) -> AsyncIterator[memoryview]:
+    for offset in range(0, len(buffer), _SEND_CHUNK_SIZE):
+        end = offset + _SEND_CHUNK_SIZE
+        yield buffer[offset:end]
+
+
+def _read_segment_chunk(path: str, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+async def _iter_file_segment(segment: FileSegment) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    end = segment.offset + segment.length
+    for offset in range(segment.offset, end, _SEND_CHUNK_SIZE):
+        length = min(_SEND_CHUNK_SIZE, end - offset)
+        yield await loop.run_in_executor(None, _read_segment_chunk, segment.path, offset, length)
+
+
+def to_request_content(content: PartContent) -> Union[bytes, AsyncIterable]:
+    """
+    Summary:
+        The function converts the content into the form accepted by httpx
+        without copying it. The buffers(bytearray, memoryview, mmap) are sent
+        as memoryview slices, and the file segment is streamed from disk.
+
+    Parameter:
+        - content(PartContent): the content to upload
+
+    return:
+        - bytes or async iterable
+    """
+    if isinstance(content, FileSegment):
+        return _iter_file_segment(content)
+    elif isinstance(content, str):
+        return content.encode()
+    elif isinstance(content, bytes):
+        return content
+    elif isinstance(content, (bytearray, memoryview, mmap.mmap)):
+        return _iter_buffer(memoryview(content).cast('B'))
+
+    return content
@@ -0,0 +1,163 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+MiB = 1024 * 1024
+MIN_PART_SIZE = 5 * MiB
+MAX_PART_SIZE = 5 * 1024 * MiB
+MAX_PART_COUNT = 10000
+
+_DEFAULT_PART_SIZE = 8 * MiB
+# the weight of latest measurement in moving average
+_SMOOTHING = 0.3
+# the part timeout is this times the expected time of part
+_TIMEOUT_FACTOR = 4
+_MIN_TIMEOUT = 60
+
+
+def _round_up(size: int, unit: int) -> int:
+    return math.ceil(size / unit) * unit
+
+
+class PartSizePolicy:
+    """
+    Summary:
+        The policy to choose the part size, concurrency and part timeout of
+        multipart upload. The part size respects the limits of object storage
+        (5MiB to 5GiB, at most 10000 parts), and grows with the throughput
+        measured on earlier parts so each part takes about `target_part_seconds`.
+
+        The concurrency is adjusted between transfers: it doubles while the
+        total throughput grows almost linearly with it, and halves when the
+        parallel parts only slow each other down.
+    """
+
+    def __init__(
+        self,
+        target_part_seconds: float = 10,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+    ) -> None:
+        """
+        Parameter:
+            - target_part_seconds(float): the expected time to upload one part
+            - min_concurrency(int): the lower bound of concurrency
+            - max_concurrency(int): the upper bound of concurrency
+            - initial_concurrency(int): the concurrency before any measurement
+        """
+        self.target_part_seconds = target_part_seconds
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = initial_concurrency
+
+        # the bytes per second of single part
+        self.part_throughput = None
+
+    def record_part(self, size: int, seconds: float) -> None:
+        """
+        Summary:
+            The function records the time spent on one part.
+
+        Parameter:
+            - size(int): the size of part in bytes
+            - seconds(float): the time to upload the part
+        """
+        if seconds <= 0 or size <= 0:
+            return
+
+        throughput = size / seconds
+        if self.part_throughput is None:
+            self.part_throughput = throughput
+        else:
+            self.part_throughput = _SMOOTHING * throughput + (1 - _SMOOTHING) * self.part_throughput
+
+    def record_transfer(self, size: int, seconds: float, concurrency: int) -> None:
+        """
+        Summary:
+            The function records the whole transfer to adjust the concurrency of
+            next transfer. The efficiency is the total throughput compared with
+            the throughput of single part times the concurrency.
+
+        Parameter:
+            - size(int): the total bytes of transfer
+            - seconds(float): the time of transfer
+            - concurrency(int): the concurrency used by transfer
+        """
+        if seconds <= 0 or size <= 0 or not self.part_throughput:
+            return
+
+        efficiency = (size / seconds) / (self.part_throughput * concurrency)
+        if efficiency > 0.8:
+            self.concurrency = min(self.max_concurrency, concurrency * 2)
+        elif efficiency < 0.5:
+            self.concurrency = max(self.min_concurrency, concurrency // 2)
+
+    def choose_part_size(self, file_size: int, part_size: int = None) -> int:
+        """
+        Summary:
+            The function chooses the part size for the file. If the part size
+            is given by caller, it is kept unless the file would need more than
+            10000 parts.
+
+        Parameter:
+            - file_size(int): the size of file in bytes
+            - part_size(int): the part size given by caller
+
+        return:
+            - int
+        """
+        if part_size is not None:
+            return max(part_size, math.ceil(file_size / MAX_PART_COUNT))
+
+        part_size = _DEFAULT_PART_SIZE
+        if self.part_throughput is not None:
+            part_size = int(self.part_throughput * self.target_part_seconds)
+
+        # the small file should be in one part instead of many tiny parts
+        part_size = max(part_size, MIN_PART_SIZE, math.ceil(file_size / MAX_PART_COUNT))
+
+        return min(_round_up(part_size, MiB), MAX_PART_SIZE)
+
+    def choose_concurrency(self, part_count: int) -> int:
+        """
+        Summary:
+            The function chooses the concurrency for the number of parts.
+
+        Parameter:
+            - part_count(int): the number of parts to upload
+
+        return:
+            - int
+        """
+        return max(1, min(self.concurrency, part_count))
+
+    def part_timeout(self, part_size: int) -> float:
+        """
+        Summary:
+            The function returns the timeout of one part based on measured
+            throughput, so the large part will not time out.
+
+        Parameter:
+            - part_size(int): the size of part in bytes
+
+        return:
+            - float: the seconds
+        """
+        if not self.part_throughput:
+            return _MIN_TIMEOUT
+
+        return max(_MIN_TIMEOUT, _TIMEOUT_FACTOR * part_size / self.part_throughput)
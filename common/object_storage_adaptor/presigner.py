@@ -0,0 +1,133 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import hmac
+from datetime import datetime
+from typing import Dict
+from urllib.parse import quote
+from urllib.parse import urlsplit
+
+_ALGORITHM = 'AWS4-HMAC-SHA256'
+_SERVICE = 's3'
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+class S3Presigner:
+    """
+    Summary:
+        The local signer to generate the AWS signature v4 presigned url
+        (path style, same as boto3 with custom endpoint). Unlike the
+        boto3 client, it doesn't go through the request pipeline, and the
+        signing key is derived once per day and reused for every url.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        session_token: str = None,
+        region: str = 'us-east-1',
+    ) -> None:
+        """
+        Parameter:
+            - endpoint(str): the endpoint of object storage with http schema
+            - access_key(str): the access key of object storage
+            - secret_key(str): the secret key of object storage
+            - session_token(str): the session token of temporary credentials
+            - region(str): the region of service (default is us-east-1)
+        """
+        self.endpoint = endpoint.rstrip('/')
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self.region = region
+
+        url = urlsplit(self.endpoint)
+        # the default port is not part of host header
+        if url.port is not None and url.port == _DEFAULT_PORTS.get(url.scheme):
+            self._host = url.hostname
+        else:
+            self._host = url.netloc
+
+        self._signing_key_date = None
+        self._signing_key = None
+
+    def _get_signing_key(self, date_stamp: str) -> bytes:
+        if self._signing_key_date != date_stamp:
+            key = _hmac_sha256(('AWS4' + self.secret_key).encode('utf-8'), date_stamp)
+            key = _hmac_sha256(key, self.region)
+            key = _hmac_sha256(key, _SERVICE)
+            self._signing_key = _hmac_sha256(key, 'aws4_request')
+            self._signing_key_date = date_stamp
+
+        return self._signing_key
+
+    def presign(
+        self, method: str, bucket: str, key: str, expires: int, query: Dict[str, str] = None, now: datetime = None
+    ) -> str:
+        """
+        Summary:
+            The function will generate the presigned url for the object.
+
+        Parameter:
+            - method(str): the http method, eg. GET or PUT
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - expires(int): how many seconds the url will be valid
+            - query(dict): the extra query parameters to sign, eg. partNumber and uploadId
+            - now(datetime): the utc time of signing, default is current time
+
+        return:
+            - presigned url(str)
+        """
+        now = now or datetime.utcnow()
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = now.strftime('%Y%m%d')
+        scope = '%s/%s/%s/aws4_request' % (date_stamp, self.region, _SERVICE)
+
+        params = dict(query or {})
+        params.update(
+            {
+                'X-Amz-Algorithm': _ALGORITHM,
+                'X-Amz-Credential': '%s/%s' % (self.access_key, scope),
+                'X-Amz-Date': amz_date,
+                'X-Amz-Expires': str(expires),
+                'X-Amz-SignedHeaders': 'host',
+            }
+        )
+        if self.session_token:
+            params['X-Amz-Security-Token'] = self.session_token
+
+        path = quote('/%s/%s' % (bucket, key), safe='/~')
+        canonical_query = '&'.join(
+            sorted('%s=%s' % (quote(str(k), safe='-_.~'), quote(str(v), safe='-_.~')) for k, v in params.items())
+        )
+        canonical_request = '\n'.join(
+            [method, path, canonical_query, 'host:%s' % self._host, '', 'host', 'UNSIGNED-PAYLOAD']
+        )
+        string_to_sign = '\n'.join(
+            [_ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()]
+        )
+        signature = hmac.new(
+            self._get_signing_key(date_stamp), string_to_sign.encode('utf-8'), hashlib.sha256
+        ).hexdigest()
+
+        return '%s%s?%s&X-Amz-Signature=%s' % (self.endpoint, path, canonical_query, signature)
@@ -0,0 +1,176 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import posixpath
+import threading
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+SYNC_MANIFEST_NAME = '.sync_manifest.json'
+
+
+def folder_prefix(prefix: str) -> str:
+    """
+    Summary:
+        The function returns the prefix as a folder, which ends with `/`, so
+        the sibling folders sharing the name(eg. `data2/` of `data`) are not
+        listed under it.
+    """
+    if not prefix or prefix.endswith('/'):
+        return prefix
+
+    return prefix + '/'
+
+
+def relative_key(key: str, prefix: str) -> str:
+    """
+    Summary:
+        The function returns the object key relative to the folder prefix.
+        None will be returned if the key is outside the folder or cannot be
+        mapped into local directory(eg. folder marker or key with `..`).
+    """
+    prefix = folder_prefix(prefix)
+    if not key.startswith(prefix):
+        return None
+
+    start = len(prefix)
+    relative_path = key[start:].lstrip('/')
+    if not relative_path or relative_path.endswith('/'):
+        return None
+
+    relative_path = posixpath.normpath(relative_path)
+    if relative_path.startswith('..') or posixpath.isabs(relative_path):
+        return None
+
+    return relative_path
+
+
+def join_key(prefix: str, relative_path: str) -> str:
+    return folder_prefix(prefix) + relative_path
+
+
+def local_path_of(local_dir: str, relative_path: str) -> str:
+    return os.path.join(local_dir, *relative_path.split('/'))
+
+
+def walk_local_files(local_dir: str, exclude: str = None) -> List[Tuple[str, int, float]]:
+    """
+    Summary:
+        The function lists all the files under local directory recursively.
+
+    Parameter:
+        - local_dir(str): the local directory
+        - exclude(str): the path of file to skip, eg. the manifest
+
+    return:
+        - list: the (relative path, size, mtime) of each file
+    """
+    files = []
+    exclude = os.path.abspath(exclude) if exclude else None
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if exclude is not None and os.path.abspath(path) == exclude:
+                continue
+
+            stat = os.stat(path)
+            relative_path = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            files.append((relative_path, stat.st_size, stat.st_mtime))
+
+    return files
+
+
+class SyncManifest:
+    """
+    Summary:
+        The local record of the last sync between a directory and a bucket
+        prefix. It keeps the size, mtime and ETag of each file, so the file
+        unchanged on both sides can be skipped without any transfer.
+    """
+
+    def __init__(self, path: str, bucket: str, prefix: str, entries: Dict[str, dict] = None) -> None:
+        """
+        Parameter:
+            - path(str): the path of manifest file
+            - bucket(str): the bucket name
+            - prefix(str): the prefix of objects
+            - entries(dict): the size, mtime and etag of each relative path
+        """
+        self.path = path
+        self.bucket = bucket
+        self.prefix = prefix
+        self.entries = entries or {}
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, bucket: str, prefix: str) -> 'SyncManifest':
+        """
+        Summary:
+            The function will read the manifest file. The empty manifest will
+            be returned if the file doesn't exist, is broken or belongs to
+            other bucket prefix.
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            if (data['bucket'], data['prefix']) == (bucket, prefix):
+                return cls(path, bucket, prefix, data['entries'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        return cls(path, bucket, prefix)
+
+    def is_unchanged(self, relative_path: str, size: int, mtime: float = None, etag: str = None) -> bool:
+        """
+        Summary:
+            The function checks if the file has same size, and same mtime
+            or etag if they are given, as the last sync.
+        """
+        entry = self.entries.get(relative_path)
+        if entry is None or entry['size'] != size:
+            return False
+        if mtime is not None and entry['mtime'] != mtime:
+            return False
+        if etag is not None and entry['etag'] != etag:
+            return False
+
+        return True
+
+    def set(self, relative_path: str, size: int, mtime: float, etag: str) -> None:
+        self.entries[relative_path] = {'size': size, 'mtime': mtime, 'etag': etag}
+
+    def pop(self, relative_path: str) -> dict:
+        return self.entries.pop(relative_path, None)
+
+    def save(self) -> None:
+        """
+        Summary:
+            The function writes the manifest file atomically.
+        """
+        with self._lock:
+            data = {'bucket': self.bucket, 'prefix': self.prefix, 'entries': dict(self.entries)}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,245 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+import aiohttp
+import httpx
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from botocore.exceptions import HTTPClientError
+from botocore.exceptions import ReadTimeoutError
+
+from common.object_storage_adaptor.metrics import get_metrics_recorder
+
+_THROTTLING_CODES = {
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'TooManyRequests',
+}
+_THROTTLING_STATUS_CODES = {429, 503}
+# the connection and timeout errors, the other errors of botocore(eg. the
+# invalid parameters or missing credentials) will fail again
+_CONNECTION_ERRORS = (
+    BotocoreConnectionError,
+    HTTPClientError,
+    ReadTimeoutError,
+    aiohttp.ClientError,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+)
+
+
+def _get_status_code(error: Exception) -> int:
+    if isinstance(error, ClientError):
+        return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+
+    return getattr(error, 'status_code', None) or 0
+
+
+def is_throttled(error: Exception) -> bool:
+    """
+    Summary:
+        The function checks if the request is rejected because the server
+        is overloaded, eg. `503 SlowDown` from MinIO.
+    """
+    if isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in _THROTTLING_CODES:
+        return True
+
+    return _get_status_code(error) in _THROTTLING_STATUS_CODES
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Summary:
+        The function checks if the failed request is worth to retry. The
+        connection level errors, throttling and server side errors(5xx) are
+        retryable.
+    """
+    if is_throttled(error) or _get_status_code(error) >= 500:
+        return True
+
+    return isinstance(error, _CONNECTION_ERRORS)
+
+
+class TransferController:
+    """
+    Summary:
+        The controller shared by all the transfers of one client. It retries
+        the idempotent operations with jittered exponential backoff, and limits
+        the number of requests in flight with AIMD: the limit is increased by
+        one after a full window of successful requests, and halved when the
+        server starts throttling.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        initial_concurrency: int = 16,
+        logger: logging.Logger = None,
+        client_name: str = 'TransferController',
+    ) -> None:
+        """
+        Parameter:
+            - max_retries(int): how many times a failed operation will be retried
+            - base_delay(float): the backoff of first retry in seconds
+            - max_delay(float): the max backoff in seconds
+            - min_concurrency(int): the lower bound of requests in flight
+            - max_concurrency(int): the upper bound of requests in flight
+            - initial_concurrency(int): the limit of requests in flight at start
+            - logger(Logger): the logger of owning client, so the retries follow
+                its log level. Default is the logger of module
+            - client_name(str): the name of owning client in the metrics of
+                waiting for slot
+        """
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+
+        self.limit = initial_concurrency
+        self.in_flight = 0
+
+        # the waiting time for slot under the concurrency limit is reported as
+        # pool wait of `client_name`. default recorder is the process-wide one
+        self.client_name = client_name
+        self.metrics = None
+
+        self._waiters = deque()
+        self._successes = 0
+        self._last_decrease = 0
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Summary:
+            The function returns the delay before the retry with full jitter,
+            so the clients throttled at same time will not retry together.
+
+        Parameter:
+            - attempt(int): the number of failed attempts, which starts from 0
+
+        return:
+            - float: the seconds
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def _acquire(self) -> None:
+        start_time = time.monotonic()
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # the slot was handed to this waiter but it is cancelled before
+                # taking it, so pass the slot to the next one
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_up()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        self.in_flight += 1
+        (self.metrics or get_metrics_recorder()).record_pool_wait(self.client_name, time.monotonic() - start_time)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake_up()
+
+    def _wake_up(self) -> None:
+        free_slots = self.limit - self.in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
+
+    def _on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            if self.limit < self.max_concurrency:
+                self.limit += 1
+                self._wake_up()
+
+    def _on_throttle(self) -> None:
+        # the requests in flight are throttled together, only decrease once for them
+        now = time.monotonic()
+        if now - self._last_decrease < self.base_delay:
+            return
+
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.min_concurrency, self.limit // 2)
+        self.logger.warning('Server is throttling, decrease the concurrency to %s', self.limit)
+
+    async def run(self, operation: Callable[[], Awaitable[Any]], max_retries: int = None) -> Any:
+        """
+        Summary:
+            The function runs the operation under the concurrency limit and
+            retries it on retryable errors. The operation is called again for
+            every attempt, so it must be idempotent and must not consume any
+            one-shot input(eg. async iterator).
+
+        Parameter:
+            - operation(callable): the function returns the awaitable of request
+            - max_retries(int): override the max retries, 0 to disable retry
+
+        return:
+            - the result of operation
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                result = await operation()
+            except Exception as e:
+                if is_throttled(e):
+                    self._on_throttle()
+                if attempt >= max_retries or not is_retryable(e):
+                    raise
+
+                error_msg = str(e)
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release()
+
+            delay = self.backoff(attempt)
+            self.logger.info('Retry the operation in %.2f seconds: %s', delay, error_msg)
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,104 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Hashable
+
+
+class TTLCache:
+    """
+    Summary:
+        The in-process cache with both time-to-live and LRU eviction.
+        The entry will be dropped once it is expired, and the least
+        recently used entry will be dropped once the cache is full.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        """
+        Parameter:
+            - maxsize(int): the max number of entries in cache
+            - ttl(float): the default seconds for entry to live
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Summary:
+            The function will return the cached value if it is not expired.
+
+        Parameter:
+            - key(hashable): the key of entry
+            - default(any): the value returned if entry is missing
+
+        return:
+            - any
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        expire_at, value = entry
+        if expire_at <= time.monotonic():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """
+        Summary:
+            The function will cache the value and evict the least recently
+            used entries if cache is full.
+
+        Parameter:
+            - key(hashable): the key of entry
+            - value(any): the value to cache
+            - ttl(float): the seconds for entry to live, default is the ttl of cache
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Summary:
+            The function will remove the entry from cache.
+
+        Parameter:
+            - key(hashable): the key of entry
+            - default(any): the value returned if entry is missing
+
+        return:
+            - any
+        """
+        entry = self._entries.pop(key, None)
+
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
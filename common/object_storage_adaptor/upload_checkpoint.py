@@ -0,0 +1,139 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import threading
+from typing import Dict
+
+
+class UploadCheckpoint:
+    """
+    Summary:
+        The local record of a multipart upload, which is used to resume
+        the upload after the process is restarted. It keeps the upload id,
+        part size and the ETag of uploaded parts, and it is bound to the
+        size and modified time of local file so a changed file will not be
+        resumed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        bucket: str,
+        key: str,
+        local_path: str,
+        upload_id: str,
+        part_size: int,
+        file_size: int,
+        mtime: float,
+        parts: Dict[int, str] = None,
+    ) -> None:
+        """
+        Parameter:
+            - path(str): the path of checkpoint file
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - local_path(str): the local path of file to upload
+            - upload_id(str): the id of multipart upload
+            - part_size(int): the size of each part in bytes
+            - file_size(int): the size of local file
+            - mtime(float): the modified time of local file
+            - parts(dict): the ETag of each uploaded part number
+        """
+        self.path = path
+        self.bucket = bucket
+        self.key = key
+        self.local_path = local_path
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.file_size = file_size
+        self.mtime = mtime
+        self.parts = parts or {}
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'UploadCheckpoint':
+        """
+        Summary:
+            The function will read the checkpoint file. None will be returned
+            if the file doesn't exist or is broken.
+
+        Parameter:
+            - path(str): the path of checkpoint file
+
+        return:
+            - UploadCheckpoint
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            return cls(
+                path,
+                data['bucket'],
+                data['key'],
+                data['local_path'],
+                data['upload_id'],
+                data['part_size'],
+                data['file_size'],
+                data['mtime'],
+                {int(part_number): etag for part_number, etag in data.get('parts', {}).items()},
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, bucket: str, key: str, local_path: str, file_size: int, mtime: float) -> bool:
+        """
+        Summary:
+            The function checks if the checkpoint belongs to the same upload
+            and the local file is not changed since then.
+        """
+        return (self.bucket, self.key, os.path.abspath(self.local_path), self.file_size, self.mtime) == (
+            bucket,
+            key,
+            os.path.abspath(local_path),
+            file_size,
+            mtime,
+        )
+
+    def save(self) -> None:
+        """
+        Summary:
+            The function writes the checkpoint file atomically. It is safe to
+            call from multiple threads, the last write always contains the
+            latest parts.
+        """
+        with self._lock:
+            data = {
+                'bucket': self.bucket,
+                'key': self.key,
+                'local_path': self.local_path,
+                'upload_id': self.upload_id,
+                'part_size': self.part_size,
+                'file_size': self.file_size,
+                'mtime': self.mtime,
+                'parts': dict(self.parts),
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
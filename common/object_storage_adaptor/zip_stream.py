@@ -0,0 +1,204 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator
+from typing import NamedTuple
+
+from common.object_storage_adaptor.boto3_client import Boto3Client
+from common.object_storage_adaptor.sync_manifest import folder_prefix
+from common.object_storage_adaptor.sync_manifest import relative_key
+
+_STREAM_CHUNK_SIZE = 1024 * 1024
+_DEFAULT_CONCURRENCY = 4
+_DEFAULT_READ_AHEAD_CHUNKS = 4
+# the earliest time can be stored in zip entry
+_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _StreamSink:
+    """
+    Summary:
+        The non-seekable file object for ZipFile. It keeps the written bytes
+        until they are drained, so ZipFile writes data descriptors instead of
+        seeking back to fix the local headers.
+    """
+
+    def __init__(self) -> None:
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _PendingEntry(NamedTuple):
+    name: str
+    obj: dict
+    queue: asyncio.Queue
+    task: asyncio.Future
+
+
+def _zip_info(name: str, obj: dict, compression: int) -> zipfile.ZipInfo:
+    last_modified = obj.get('LastModified')
+    date_time = last_modified.timetuple()[:6] if isinstance(last_modified, datetime) else _MIN_DATE_TIME
+
+    zip_info = zipfile.ZipInfo(name, max(date_time, _MIN_DATE_TIME))
+    zip_info.compress_type = compression
+    zip_info.file_size = obj.get('Size', 0)
+    zip_info.external_attr = 0o644 << 16
+
+    return zip_info
+
+
+async def _read_object(client: Boto3Client, bucket: str, key: str, queue: asyncio.Queue, chunk_size: int) -> None:
+    """
+    Summary:
+        The function reads the object into the bounded queue. It puts None
+        when it finishes, or the error when it fails.
+    """
+    try:
+        async for chunk in client.stream_object(bucket, key, chunk_size=chunk_size):
+            await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+        return
+    await queue.put(None)
+
+
+async def _next_object(objects: AsyncIterator[dict], prefix: str) -> tuple:
+    # skip the folder markers and the keys cannot be the path in archive
+    async for obj in objects:
+        name = relative_key(obj['Key'], prefix)
+        if name is not None:
+            return name, obj
+
+    return None
+
+
+async def stream_zip(
+    client: Boto3Client,
+    bucket: str,
+    prefix: str,
+    concurrency: int = _DEFAULT_CONCURRENCY,
+    chunk_size: int = _STREAM_CHUNK_SIZE,
+    read_ahead_chunks: int = _DEFAULT_READ_AHEAD_CHUNKS,
+    compression: int = zipfile.ZIP_STORED,
+) -> AsyncIterator[bytes]:
+    """
+    Summary:
+        The function is the async generator of ZIP64 archive of all the objects
+        under prefix. The objects are read concurrently and the archive is
+        yielded as it goes, without any temporary file. The entries keep the
+        path relative to prefix and are in the listing order.
+
+            async for chunk in stream_zip(client, bucket, 'project/folder/'):
+                await response.write(chunk)
+
+        The read-ahead is bounded, at most `concurrency` objects including the
+        entry being written are read at same time, and each of them buffers at
+        most `read_ahead_chunks` chunks. The memory usage is about
+        concurrency * read_ahead_chunks * chunk_size no matter how large the
+        folder is. If any object fails, the iteration raises the error and the
+        archive is left incomplete.
+
+    Parameter:
+        - client(Boto3Client): the connected client
+        - bucket(str): the bucket name
+        - prefix(str): the folder of objects, `/` is appended if missing
+        - concurrency(int): the max number of objects read at same time
+        - chunk_size(int): the max size of each chunk read from object
+        - read_ahead_chunks(int): the max chunks buffered for each object
+        - compression(int): the compression of entries, eg. ZIP_DEFLATED,
+            default is ZIP_STORED since most of the data is already compressed
+
+    return:
+        - async iterator of bytes
+    """
+    prefix = folder_prefix(prefix)
+    sink = _StreamSink()
+    zip_file = zipfile.ZipFile(sink, 'w', compression=compression, allowZip64=True)
+    objects = client.iter_objects(bucket, prefix)
+    pending = deque()
+
+    async def _fill() -> None:
+        while len(pending) < concurrency:
+            item = await _next_object(objects, prefix)
+            if item is None:
+                return
+
+            name, obj = item
+            queue = asyncio.Queue(maxsize=read_ahead_chunks)
+            task = asyncio.ensure_future(_read_object(client, bucket, obj['Key'], queue, chunk_size))
+            pending.append(_PendingEntry(name, obj, queue, task))
+
+    try:
+        await _fill()
+        while pending:
+            async for data in _write_entry(zip_file, sink, pending[0], compression):
+                yield data
+
+            pending.popleft()
+            await _fill()
+
+        zip_file.close()
+        yield sink.drain()
+    finally:
+        for entry in pending:
+            entry.task.cancel()
+        await asyncio.gather(*(entry.task for entry in pending), return_exceptions=True)
+        await objects.aclose()
+
+
+async def _write_entry(
+    zip_file: zipfile.ZipFile, sink: _StreamSink, entry: _PendingEntry, compression: int
+) -> AsyncIterator[bytes]:
+    """
+    Summary:
+        The function writes the chunks of object into the archive and yields
+        the bytes of archive produced by them. The compression runs in the
+        executor so it doesn't block the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with zip_file.open(_zip_info(entry.name, entry.obj, compression), 'w', force_zip64=True) as zip_entry:
+        while True:
+            chunk = await entry.queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+
+            if compression == zipfile.ZIP_STORED:
+                zip_entry.write(chunk)
+            else:
+                await loop.run_in_executor(None, zip_entry.write, chunk)
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # the data descriptor is written when the entry is closed
+    yield sink.drain()
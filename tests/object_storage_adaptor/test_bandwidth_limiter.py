@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+
+from common.object_storage_adaptor.bandwidth_limiter import BandwidthLimiter
+from common.object_storage_adaptor.bandwidth_limiter import TokenBucket
+from common.object_storage_adaptor.bandwidth_limiter import get_process_bandwidth_limit
+from common.object_storage_adaptor.bandwidth_limiter import set_process_bandwidth_limit
+
+
+@patch('common.object_storage_adaptor.bandwidth_limiter.time.monotonic')
+def test_token_bucket_waits_for_debt_and_refills_up_to_burst(monotonic):
+    monotonic.return_value = 100
+    bucket = TokenBucket(rate=100, burst=200)
+
+    assert bucket.reserve(150) == 0
+    assert bucket.reserve(100) == 0.5
+
+    monotonic.return_value = 101
+    assert bucket.reserve(0) == 0
+    assert bucket.tokens == 50
+
+    monotonic.return_value = 200
+    assert bucket.reserve(0) == 0
+    assert bucket.tokens == 200
+
+
+def test_token_bucket_requires_positive_rate():
+    try:
+        TokenBucket(rate=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('ValueError is not raised')
+
+
+@patch('common.object_storage_adaptor.bandwidth_limiter.asyncio.sleep')
+async def test_bandwidth_limiter_waits_for_slower_budget(sleep):
+    set_process_bandwidth_limit(rate=10, burst=10)
+    try:
+        limiter = BandwidthLimiter(rate=100, burst=100)
+        assert limiter.enabled
+
+        await limiter.consume(30)
+    finally:
+        set_process_bandwidth_limit(None)
+
+    sleep.assert_called_once()
+    assert sleep.call_args.args[0] == pytest.approx(2, abs=0.01)
+    assert get_process_bandwidth_limit() is None
+    assert not BandwidthLimiter().enabled
+
+
+@patch('common.object_storage_adaptor.bandwidth_limiter._THROTTLE_CHUNK_SIZE', 4)
+async def test_bandwidth_limiter_limits_stream_by_chunks():
+    limiter = BandwidthLimiter(rate=1000)
+
+    async def _content():
+        yield b'abc'
+        yield b'de'
+
+    assert [bytes(chunk) async for chunk in limiter.limit_stream(b'0123456789')] == [b'0123', b'4567', b'89']
+    assert [chunk async for chunk in limiter.limit_stream(_content())] == [b'abc', b'de']
+    assert limiter.bucket.tokens == pytest.approx(985, abs=1)
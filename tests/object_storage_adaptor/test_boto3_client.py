@@ -1,15 +1,120 @@
+import asyncio
+import gc
+import hashlib
+import re
+from datetime import datetime
+from datetime import timedelta
+
+import aiohttp
 import httpx
+import pytest_asyncio
+from botocore.exceptions import ClientError
+from botocore.paginate import TokenDecoder
+from dicttoxml import dicttoxml
 from httpx import Response
 from logging import ERROR, DEBUG
 
+from unittest.mock import MagicMock
 from unittest.mock import call
 from unittest.mock import patch
 
 from common.object_storage_adaptor.boto3_client import Boto3Client, TokenError
+from common.object_storage_adaptor.boto3_client import MultipartUploadPreparationError
+from common.object_storage_adaptor.boto3_client import PartUploadError
+from common.object_storage_adaptor.boto3_client import _sts_cache
 from common.object_storage_adaptor.boto3_client import get_boto3_client
+from common.object_storage_adaptor.metrics import InMemoryMetricsRecorder
+from common.object_storage_adaptor.part_content import FileSegment
+from common.object_storage_adaptor.part_size import PartSizePolicy
+from common.object_storage_adaptor.transfer_controller import TransferController
+from common.object_storage_adaptor.upload_checkpoint import UploadCheckpoint
 from tests.conftest import PROJECT_CREDENTIALS
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def close_dropped_clients():
+    yield
+    # the clients dropped by the test close their pools in background, let the
+    # closes finish before the loop is closed
+    gc.collect()
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+class FakeRawResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def read(self):
+        return self.content
+
+
+class FakeBody:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.position = 0
+
+    async def __aenter__(self):
+        # like StreamingBody, the context manager yields the raw response
+        # whose read() takes no size
+        return FakeRawResponse(self.content)
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self, amt=None):
+        start = self.position
+        end = len(self.content) if amt is None else start + amt
+        chunk = self.content[start:end]
+        self.position += len(chunk)
+        return chunk
+
+
+class FakePaginator:
+    def __init__(self, pages: list):
+        self.pages = pages
+        self.params = None
+
+    async def _paginate(self):
+        for page in self.pages:
+            yield page
+
+    def paginate(self, **params):
+        self.params = params
+        return self._paginate()
+
+
+def add_sts_response(httpx_mock, token: str, expiration: datetime) -> None:
+    url = httpx.URL(
+        'http://project',
+        params={
+            'Action': 'AssumeRoleWithWebIdentity',
+            'WebIdentityToken': token,
+            'Version': '2011-06-15',
+            'DurationSeconds': 86000,
+        },
+    )
+    credentials = dict(PROJECT_CREDENTIALS, Expiration=expiration.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    xml = dicttoxml(
+        {'AssumeRoleWithWebIdentityResponse': {'AssumeRoleWithWebIdentityResult': {'Credentials': credentials}}},
+        attr_type=False,
+        root=False,
+    ).decode('utf-8')
+    httpx_mock.add_response(method='POST', url=url, status_code=200, text=xml)
+
+
+def fake_get_object(content: bytes):
+    async def _get_object(Bucket, Key, Range=None, **kwargs):
+        if Range is None:
+            return {'Body': FakeBody(content), 'ContentLength': len(content)}
+        start, end = re.match(r'bytes=(\d+)-(\d*)', Range).groups()
+        start = int(start)
+        end = int(end) + 1 if end else len(content)
+        return {'Body': FakeBody(content[start:end]), 'ContentLength': end - start}
+
+    return _get_object
+
+
 async def test_boto3_client_check_log_level_debug():
     boto3_client = Boto3Client(endpoint='project', token='test')
     assert boto3_client.logger.level == ERROR
@@ -126,6 +231,7 @@ async def test_boto3_client_downloads_the_file_from_s3(_client):
 
 @patch('aioboto3.Session.client')
 async def test_boto3_client_copy_file_copies_the_file_from_s3(_client):
+    _client.return_value.__aenter__.return_value.head_object.return_value = {'ContentLength': 10}
     boto3_client = Boto3Client(
         endpoint='project',
         access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
@@ -140,6 +246,7 @@ async def test_boto3_client_copy_file_copies_the_file_from_s3(_client):
             call().__aenter__().copy_object(Bucket='test', CopySource='/test/path', Key='/path/new'),
         ]
     )
+    _client.return_value.__aenter__.return_value.head_object.assert_not_called()
 
 
 @patch('aioboto3.Session.client')
@@ -232,6 +339,89 @@ async def test_boto3_client_part_upload_fail(_client, mocker):
         assert str(e) == 'Fail to upload the chunck 1: error'
 
 
+@patch('aioboto3.Session.client')
+async def test_boto3_client_part_upload_retries_throttled_part(_client, mocker):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    put = mocker.patch(
+        'httpx.AsyncClient.put',
+        side_effect=[
+            Response(status_code=503, text='SlowDown'),
+            Response(status_code=200, headers={'ETag': '"etag"'}),
+        ],
+    )
+
+    controller = TransferController(base_delay=0, initial_concurrency=4)
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        transfer_controller=controller,
+    )
+    await boto3_client.init_connection()
+    part = await boto3_client.part_upload('test', '/path', 'test_id', 1, b'content')
+
+    assert part == {'ETag': 'etag', 'PartNumber': 1}
+    assert put.call_count == 2
+    assert controller.limit == 2
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_records_metrics(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    boto3_client.metrics = InMemoryMetricsRecorder()
+    await boto3_client.init_connection()
+    await boto3_client.upload_file('test', '/test/path', str(local_file), part_size=4)
+
+    operations = {item['operation']: item for item in boto3_client.metrics.snapshot()['operations']}
+    assert operations['part_upload']['count'] == 3
+    assert operations['part_upload']['bytes'] == 10
+    assert operations['upload_file']['bytes'] == 10
+    assert operations['combine_chunks']['errors'] == 0
+    # the waiting for slot of transfer controller is reported under the client
+    pool_wait = boto3_client.metrics.snapshot()['pool_wait']
+    assert [item['client'] for item in pool_wait] == ['Boto3Client']
+    assert pool_wait[0]['latency']['count'] == 5
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_part_upload_does_not_retry_async_iterator(_client, mocker):
+    async def _content():
+        yield b'content'
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=503, text='SlowDown'))
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        transfer_controller=TransferController(base_delay=0),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.part_upload('test', '/path', 'test_id', 1, _content(), content_length=7)
+    except PartUploadError as e:
+        assert e.status_code == 503
+    else:
+        raise AssertionError('PartUploadError is not raised')
+
+    put.assert_called_once()
+
+
 @patch('aioboto3.Session.client')
 async def test_boto3_client_combine_chunks_combines_chunks(_client):
     boto3_client = Boto3Client(
@@ -291,9 +481,1210 @@ async def test_boto3_client_stat_object(_client):
     assert _client.call_count == 1
     _client.assert_has_calls(
         [
-            call().__aenter__().get_object(
+            call().__aenter__().head_object(
                 Bucket='test',
                 Key='/test/path',
             )
         ]
-    )
\ No newline at end of file
+    )
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_reuses_pooled_client_between_operations(_client):
+    _client.return_value.__aenter__.return_value.head_object.return_value = {'ContentLength': 10}
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        max_pool_connections=32,
+    )
+    await boto3_client.init_connection()
+    await boto3_client.delete_object('test', '/test/path')
+    await boto3_client.copy_object('test', '/test/path', 'test', '/path/new')
+
+    # both operations share the same s3 client
+    assert _client.call_count == 1
+    assert boto3_client._config.max_pool_connections == 32
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_context_manager_closes_pooled_client(_client):
+    async with Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    ) as boto3_client:
+        await boto3_client.delete_object('test', '/test/path')
+
+    _client.return_value.__aexit__.assert_called_once_with(None, None, None)
+    assert boto3_client._pool.client is None
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_closes_pooled_client_when_dropped(_client):
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.delete_object('test', '/test/path')
+
+    # the client created for each request is often dropped without closing
+    del boto3_client
+    gc.collect()
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    _client.return_value.__aexit__.assert_called_once_with(None, None, None)
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_chooses_part_size_by_policy(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+
+    policy = PartSizePolicy()
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        part_size_policy=policy,
+    )
+    await boto3_client.init_connection()
+    await boto3_client.upload_file('test', '/test/path', str(local_file))
+
+    # the small file is uploaded in one part
+    put.assert_called_once()
+    assert put.call_args.kwargs['timeout'] == 60
+    assert policy.part_throughput is not None
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_uploads_parts_and_combines_them(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.upload_file('test', '/test/path', str(local_file), part_size=4, concurrency=2)
+
+    assert put.call_count == 3
+    s3.complete_multipart_upload.assert_called_once_with(
+        Bucket='test',
+        Key='/test/path',
+        MultipartUpload={
+            'Parts': [
+                {'ETag': 'etag', 'PartNumber': 1},
+                {'ETag': 'etag', 'PartNumber': 2},
+                {'ETag': 'etag', 'PartNumber': 3},
+            ]
+        },
+        UploadId='upload_id',
+    )
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_aborts_upload_on_failure(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=500, text='error'))
+
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.upload_file('test', '/test/path', str(local_file), part_size=4)
+    except Exception as e:
+        assert str(e).startswith('Fail to upload the chunck')
+
+    s3.abort_multipart_upload.assert_called_once_with(Bucket='test', Key='/test/path', UploadId='upload_id')
+    s3.complete_multipart_upload.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_download_object_in_parts_writes_ranges_at_offsets(_client, tmp_path):
+    content = b'0123456789'
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': len(content), 'ETag': '"etag"'}
+    s3.get_object.side_effect = fake_get_object(content)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    local_path = tmp_path / 'folder' / 'file'
+    await boto3_client.download_object_in_parts('test', '/test/path', str(local_path), part_size=3, concurrency=2)
+
+    assert local_path.read_bytes() == content
+    assert s3.get_object.call_count == 4
+    s3.get_object.assert_any_call(Bucket='test', Key='/test/path', Range='bytes=9-9', IfMatch='"etag"')
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_download_object_streams_with_bandwidth_limit(_client, tmp_path):
+    content = b'0123456789'
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_object.side_effect = fake_get_object(content)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        bandwidth_limit=1024 * 1024,
+    )
+    boto3_client.metrics = InMemoryMetricsRecorder()
+    await boto3_client.init_connection()
+    local_path = tmp_path / 'file'
+    await boto3_client.download_object('test', '/test/path', str(local_path))
+
+    assert local_path.read_bytes() == content
+    s3.download_file.assert_not_called()
+    assert boto3_client.bandwidth_limiter.bucket.tokens < 1024 * 1024
+    operations = {stats['operation']: stats for stats in boto3_client.metrics.snapshot()['operations']}
+    assert operations['download_object']['bytes'] == len(content)
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_download_object_with_bandwidth_limit_keeps_no_file_on_error(_client, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_object.side_effect = ClientError(
+        {'Error': {'Code': 'NoSuchKey', 'Message': 'not found'}, 'ResponseMetadata': {'HTTPStatusCode': 404}},
+        'GetObject',
+    )
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        bandwidth_limit=1024 * 1024,
+    )
+    await boto3_client.init_connection()
+    local_path = tmp_path / 'file'
+    try:
+        await boto3_client.download_object('test', '/test/path', str(local_path))
+    except ClientError as e:
+        assert e.response['Error']['Code'] == 'NoSuchKey'
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_download_object_in_parts_retries_failed_range(_client, tmp_path):
+    content = b'0123456789'
+    get_object = fake_get_object(content)
+    failed_ranges = set()
+
+    async def _flaky_get_object(Bucket, Key, Range=None, **kwargs):
+        if Range not in failed_ranges:
+            failed_ranges.add(Range)
+            raise aiohttp.ClientConnectionError('connection reset')
+        return await get_object(Bucket, Key, Range)
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': len(content), 'ETag': '"etag"'}
+    s3.get_object.side_effect = _flaky_get_object
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        transfer_controller=TransferController(base_delay=0),
+    )
+    await boto3_client.init_connection()
+    local_path = tmp_path / 'file'
+    await boto3_client.download_object_in_parts('test', '/test/path', str(local_path), part_size=5)
+
+    assert local_path.read_bytes() == content
+    assert s3.get_object.call_count == 4
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_stat_object_uses_cache_until_object_changes(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"etag"'}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        stat_cache_ttl=60,
+    )
+    await boto3_client.init_connection()
+    first = await boto3_client.stat_object('test', '/test/path')
+    second = await boto3_client.stat_object('test', '/test/path')
+    await boto3_client.stat_object('test', '/test/path', version_id='version')
+
+    assert first == second == {'ContentLength': 10, 'ETag': '"etag"'}
+    assert s3.head_object.call_count == 2
+    s3.head_object.assert_called_with(Bucket='test', Key='/test/path', VersionId='version')
+
+    await boto3_client.delete_object('test', '/test/path')
+    await boto3_client.stat_object('test', '/test/path')
+
+    assert s3.head_object.call_count == 3
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_get_download_presigned_urls_signs_locally(_client):
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    presigned_urls = await boto3_client.get_download_presigned_urls('test', ['/test/path', '/test/path2'])
+
+    assert _client.call_count == 0
+    assert list(presigned_urls) == ['/test/path', '/test/path2']
+    assert presigned_urls['/test/path'].startswith('http://project/test//test/path?')
+    assert 'X-Amz-Expires=3600' in presigned_urls['/test/path2']
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_presigner_signs_with_region_of_session(_client, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'ca-central-1')
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    presigned_urls = await boto3_client.get_download_presigned_urls('test', ['/test/path'])
+
+    assert '%2Fca-central-1%2Fs3%2Faws4_request' in presigned_urls['/test/path']
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_get_part_upload_presigned_urls_signs_all_parts(_client):
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    presigned_urls = await boto3_client.get_part_upload_presigned_urls('test', 'path', 'upload_id', range(1, 4))
+
+    assert _client.call_count == 0
+    assert list(presigned_urls) == [1, 2, 3]
+    assert presigned_urls[2].startswith('http://project/test/path?')
+    assert 'partNumber=2&' in presigned_urls[2]
+    assert 'uploadId=upload_id' in presigned_urls[2]
+    assert presigned_urls[1] != presigned_urls[3]
+
+
+@patch('common.object_storage_adaptor.presigner.datetime')
+async def test_boto3_client_get_download_presigned_urls_reuses_cached_url(_datetime):
+    _datetime.utcnow.side_effect = [datetime(2022, 7, 1, 12, 0, 0), datetime(2022, 7, 1, 12, 0, 1)]
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        presigned_url_cache_size=10,
+    )
+    await boto3_client.init_connection()
+    first = await boto3_client.get_download_presigned_urls('test', ['/test/path'])
+    second = await boto3_client.get_download_presigned_urls('test', ['/test/path'])
+    other_duration = await boto3_client.get_download_presigned_urls('test', ['/test/path'], duration=60)
+
+    assert first == second
+    assert first != other_duration
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_prepare_multipart_upload_reports_failed_keys(_client):
+    async def _create_multipart_upload(Bucket, Key):
+        if Key == '/test/path2':
+            raise Exception('error')
+        return {'UploadId': 'upload' + Key}
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.side_effect = _create_multipart_upload
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    keys = ['/test/path', '/test/path2', '/test/path3']
+    try:
+        await boto3_client.prepare_multipart_upload('test', keys, concurrency=2)
+    except MultipartUploadPreparationError as e:
+        assert e.upload_ids == ['upload/test/path', None, 'upload/test/path3']
+        assert list(e.errors) == ['/test/path2']
+    else:
+        raise AssertionError('MultipartUploadPreparationError is not raised')
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_delete_objects_sends_chunks_of_1000_keys(_client):
+    async def _delete_objects(Bucket, Delete):
+        first_key = Delete['Objects'][0]['Key']
+        if first_key == 'key1000':
+            raise Exception('error')
+        elif first_key == 'key0':
+            return {'Errors': [{'Key': 'key0', 'Code': 'AccessDenied', 'Message': 'denied'}]}
+        return {}
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.delete_objects.side_effect = _delete_objects
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    keys = ['key%s' % i for i in range(2500)]
+    errors = await boto3_client.delete_objects('test', keys, versions=['version'] + [None] * 2499)
+
+    assert s3.delete_objects.call_count == 3
+    first_chunk = s3.delete_objects.call_args_list[0][1]['Delete']
+    assert first_chunk['Quiet'] is True
+    assert first_chunk['Objects'][0] == {'Key': 'key0', 'VersionId': 'version'}
+    assert first_chunk['Objects'][1] == {'Key': 'key1'}
+    # one error from server and the whole second chunk failed
+    assert len(errors) == 1001
+    assert errors[0]['Code'] == 'AccessDenied'
+    assert errors[1] == {'Key': 'key1000', 'Code': 'Exception', 'Message': 'error'}
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_delete_prefix_deletes_listed_objects(_client):
+    paginator = FakePaginator(
+        [
+            {'Contents': [{'Key': 'folder/file%s' % i} for i in range(1000)]},
+            {'Contents': [{'Key': 'folder/last'}]},
+        ]
+    )
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+    s3.delete_objects.return_value = {}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    errors = await boto3_client.delete_prefix('test', 'folder/')
+
+    assert errors == []
+    assert paginator.params == {'Bucket': 'test', 'Prefix': 'folder/'}
+    assert s3.delete_objects.call_count == 2
+    s3.delete_objects.assert_called_with(Bucket='test', Delete={'Objects': [{'Key': 'folder/last'}], 'Quiet': True})
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_delete_prefix_keeps_sibling_folder(_client):
+    paginator = FakeListingPaginator(['del/dest/a', 'del/dest/sub/b', 'del/dest2/keep'])
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+    s3.delete_objects.return_value = {}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    errors = await boto3_client.delete_prefix('test', 'del/dest')
+
+    assert errors == []
+    s3.delete_objects.assert_called_once_with(
+        Bucket='test', Delete={'Objects': [{'Key': 'del/dest/a'}, {'Key': 'del/dest/sub/b'}], 'Quiet': True}
+    )
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_copy_object_uses_multipart_copy_above_threshold(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {
+        'ContentLength': 10,
+        'ETag': '"source"',
+        'ContentType': 'text/csv',
+        'Metadata': {'owner': 'alice'},
+    }
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.upload_part_copy.return_value = {'CopyPartResult': {'ETag': '"etag"'}}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.copy_object(
+        'source', 'file', 'dest', 'file', size=10, multipart_threshold=5, part_size=4, concurrency=2
+    )
+
+    s3.copy_object.assert_not_called()
+    s3.create_multipart_upload.assert_called_once_with(
+        Bucket='dest', Key='file', ContentType='text/csv', Metadata={'owner': 'alice', 'part-size': '4'}
+    )
+    assert s3.upload_part_copy.call_count == 3
+    s3.upload_part_copy.assert_any_call(
+        Bucket='dest',
+        Key='file',
+        CopySource='source/file',
+        CopySourceRange='bytes=8-9',
+        CopySourceIfMatch='"source"',
+        PartNumber=3,
+        UploadId='upload_id',
+    )
+    s3.complete_multipart_upload.assert_called_once_with(
+        Bucket='dest',
+        Key='file',
+        MultipartUpload={
+            'Parts': [
+                {'ETag': 'etag', 'PartNumber': 1},
+                {'ETag': 'etag', 'PartNumber': 2},
+                {'ETag': 'etag', 'PartNumber': 3},
+            ]
+        },
+        UploadId='upload_id',
+    )
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_multipart_copy_pins_source_etag_and_aborts_on_failure(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"source"'}
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.upload_part_copy.side_effect = Exception('error')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.copy_object('source', 'file', 'dest', 'file', size=10, multipart_threshold=5, part_size=5)
+    except Exception as e:
+        assert str(e) == 'error'
+
+    assert s3.upload_part_copy.call_args[1]['CopySourceIfMatch'] == '"source"'
+    s3.abort_multipart_upload.assert_called_once_with(Bucket='dest', Key='file', UploadId='upload_id')
+    s3.complete_multipart_upload.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_copy_object_falls_back_to_multipart_copy_for_large_source(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.copy_object.side_effect = ClientError(
+        {'Error': {'Code': 'InvalidRequest', 'Message': 'source too large'}, 'ResponseMetadata': {}}, 'CopyObject'
+    )
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"source"'}
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.upload_part_copy.return_value = {'CopyPartResult': {'ETag': '"etag"'}}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.copy_object('source', 'file', 'dest', 'file', multipart_threshold=5, part_size=5)
+
+    s3.head_object.assert_called_once_with(Bucket='source', Key='file')
+    assert s3.upload_part_copy.call_count == 2
+    s3.complete_multipart_upload.assert_called_once()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_copy_object_raises_rejected_copy_of_small_source(_client):
+    error = ClientError(
+        {'Error': {'Code': 'InvalidRequest', 'Message': 'copy to itself without change'}, 'ResponseMetadata': {}},
+        'CopyObject',
+    )
+    s3 = _client.return_value.__aenter__.return_value
+    s3.copy_object.side_effect = error
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"source"'}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.copy_object('source', 'file', 'source', 'file', multipart_threshold=10, part_size=5)
+    except ClientError as e:
+        assert e is error
+
+    s3.head_object.assert_called_once_with(Bucket='source', Key='file')
+    s3.create_multipart_upload.assert_not_called()
+    s3.upload_part_copy.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_copy_prefix_copies_listed_objects_and_reports_progress(_client):
+    paginator = FakePaginator(
+        [
+            {'Contents': [{'Key': 'folder/a', 'Size': 1}, {'Key': 'folder/sub/b', 'Size': 2}]},
+            {'Contents': [{'Key': 'folder/c', 'Size': 3}]},
+        ]
+    )
+
+    async def _copy_object(Bucket, CopySource, Key):
+        if Key == 'new/c':
+            raise Exception('error')
+        return {}
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+    s3.copy_object.side_effect = _copy_object
+    progress = []
+
+    async def _progress_callback(info):
+        progress.append(info)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    result = await boto3_client.copy_prefix(
+        'greenroom', 'folder/', 'core', 'new/', concurrency=2, progress_callback=_progress_callback
+    )
+
+    assert result == {'copied_count': 2, 'copied_bytes': 3, 'errors': {'folder/c': 'error'}}
+    s3.head_object.assert_not_called()
+    s3.copy_object.assert_any_call(Bucket='core', CopySource='greenroom/folder/sub/b', Key='new/sub/b')
+    assert sorted(info['dest_key'] for info in progress) == ['new/a', 'new/c', 'new/sub/b']
+    assert [info['error'] for info in progress if info['key'] == 'folder/c'] == ['error']
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_copy_prefix_copies_folder_without_sibling(_client):
+    paginator = FakeListingPaginator(['src/a', 'src/sub/', 'src/sub/b', 'src2/keep'])
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+    s3.copy_object.return_value = {}
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    result = await boto3_client.copy_prefix('greenroom', 'src', 'core', 'dest/')
+
+    assert result == {'copied_count': 2, 'copied_bytes': 2, 'errors': {}}
+    assert sorted(args[1]['Key'] for args in s3.copy_object.call_args_list) == ['dest/a', 'dest/sub/b']
+
+
+@patch('aioboto3.Session')
+async def test_boto3_client_init_connection_reuses_cached_temporary_credentials(_session, httpx_mock):
+    _sts_cache.clear()
+    add_sts_response(httpx_mock, 'cached-token', datetime.utcnow() + timedelta(hours=1))
+
+    for _ in range(3):
+        boto3_client = Boto3Client(endpoint='project', token='cached-token')
+        await boto3_client.init_connection()
+
+    assert len(httpx_mock.get_requests()) == 1
+    assert boto3_client.access_key == PROJECT_CREDENTIALS.get('AccessKeyId')
+    assert boto3_client.session_token == PROJECT_CREDENTIALS.get('SessionToken')
+
+
+@patch('aioboto3.Session')
+async def test_boto3_client_init_connection_refreshes_expiring_credentials_in_background(_session, httpx_mock):
+    _sts_cache.clear()
+    add_sts_response(httpx_mock, 'expiring-token', datetime.utcnow() + timedelta(minutes=5))
+
+    boto3_client = Boto3Client(endpoint='project', token='expiring-token')
+    await boto3_client.init_connection()
+    await boto3_client.init_connection()
+    assert len(httpx_mock.get_requests()) == 1
+
+    # the background refresh is running while client starts with cached credentials
+    await asyncio.sleep(0.1)
+    assert len(httpx_mock.get_requests()) == 2
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_stream_object_yields_chunks_of_range(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_object.side_effect = fake_get_object(b'0123456789')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    chunks = [chunk async for chunk in boto3_client.stream_object('test', '/test/path', chunk_size=3)]
+    range_chunks = [
+        chunk async for chunk in boto3_client.stream_object('test', '/test/path', chunk_size=3, byte_range=(2, None))
+    ]
+
+    assert chunks == [b'012', b'345', b'678', b'9']
+    assert range_chunks == [b'234', b'567', b'89']
+    s3.get_object.assert_called_with(Bucket='test', Key='/test/path', Range='bytes=2-')
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_keeps_checkpoint_when_part_fails(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.generate_presigned_url.side_effect = lambda ClientMethod, Params: 'http://project/%s' % Params['PartNumber']
+
+    async def _put(url, **kwargs):
+        if url.endswith('/2'):
+            return Response(status_code=500, text='error')
+        return Response(status_code=200, headers={'ETag': '"etag%s"' % url[-1]})
+
+    mocker.patch('httpx.AsyncClient.put', side_effect=_put)
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+    checkpoint_path = tmp_path / 'checkpoint.json'
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.upload_file(
+            'test', 'file', str(local_file), part_size=4, concurrency=1, checkpoint_path=str(checkpoint_path)
+        )
+    except Exception as e:
+        assert str(e) == 'Fail to upload the chunck 2: error'
+
+    s3.abort_multipart_upload.assert_not_called()
+    checkpoint = UploadCheckpoint.load(str(checkpoint_path))
+    assert checkpoint.upload_id == 'upload_id'
+    assert checkpoint.part_size == 4
+    assert checkpoint.parts[1] == 'etag1'
+    assert 2 not in checkpoint.parts
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_resumes_from_checkpoint(_client, mocker, tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+    checkpoint_path = tmp_path / 'checkpoint.json'
+    UploadCheckpoint(
+        str(checkpoint_path),
+        'test',
+        'file',
+        str(local_file),
+        'upload_id',
+        4,
+        10,
+        local_file.stat().st_mtime,
+        {1: 'etag1'},
+    ).save()
+
+    s3 = _client.return_value.__aenter__.return_value
+    stored_parts = [{'PartNumber': 1, 'ETag': '"etag1"', 'Size': 4}]
+    s3.get_paginator = MagicMock(return_value=FakePaginator([{'Parts': stored_parts}]))
+    s3.generate_presigned_url.side_effect = lambda ClientMethod, Params: 'http://project/%s' % Params['PartNumber']
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.upload_file('test', 'file', str(local_file), part_size=8, checkpoint_path=str(checkpoint_path))
+
+    s3.create_multipart_upload.assert_not_called()
+    assert sorted(call_args[0][0] for call_args in put.call_args_list) == ['http://project/2', 'http://project/3']
+    s3.complete_multipart_upload.assert_called_once_with(
+        Bucket='test',
+        Key='file',
+        MultipartUpload={
+            'Parts': [
+                {'ETag': 'etag1', 'PartNumber': 1},
+                {'ETag': 'etag', 'PartNumber': 2},
+                {'ETag': 'etag', 'PartNumber': 3},
+            ]
+        },
+        UploadId='upload_id',
+    )
+    assert not checkpoint_path.exists()
+
+
+class FakeListingPaginator:
+    def __init__(self, keys: list, page_size: int = 2):
+        self.keys = sorted(keys)
+        self.page_size = page_size
+        self.prefixes = []
+
+    async def paginate(self, Bucket, Prefix, Delimiter=None):
+        self.prefixes.append((Prefix, Delimiter))
+        contents, common_prefixes = [], []
+        for key in self.keys:
+            if not key.startswith(Prefix):
+                continue
+            start = len(Prefix)
+            rest = key[start:]
+            if Delimiter and Delimiter in rest:
+                common_prefix = Prefix + rest.split(Delimiter)[0] + Delimiter
+                if {'Prefix': common_prefix} not in common_prefixes:
+                    common_prefixes.append({'Prefix': common_prefix})
+            else:
+                contents.append({'Key': key, 'Size': 1})
+        for i in range(0, max(len(contents), 1), self.page_size):
+            end = i + self.page_size
+            page = {'Contents': contents[i:end]}
+            if i == 0:
+                page['CommonPrefixes'] = common_prefixes
+            yield page
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_iter_objects_yields_objects_and_common_prefixes(_client):
+    paginator = FakeListingPaginator(['folder/a', 'folder/b', 'folder/c', 'folder/sub/d'])
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    objects = [obj async for obj in boto3_client.iter_objects('test', 'folder/', delimiter='/')]
+
+    assert objects == [
+        {'Key': 'folder/a', 'Size': 1},
+        {'Key': 'folder/b', 'Size': 1},
+        {'Prefix': 'folder/sub/'},
+        {'Key': 'folder/c', 'Size': 1},
+    ]
+    s3.get_paginator.assert_called_with('list_objects_v2')
+
+
+class FlakyPaginator:
+    def __init__(self):
+        self.calls = []
+
+    async def _paginate(self, starting_token):
+        if starting_token is None:
+            yield {'Contents': [{'Key': 'a'}], 'NextContinuationToken': 'token-1'}
+            raise aiohttp.ClientConnectionError('connection reset')
+        yield {'Contents': [{'Key': 'b'}]}
+
+    def paginate(self, **params):
+        self.calls.append(params)
+        starting_token = params.get('PaginationConfig', {}).get('StartingToken')
+        return self._paginate(starting_token)
+
+
+async def test_boto3_client_disables_botocore_retries():
+    boto3_client = Boto3Client(endpoint='project', access_key='test', secret_key='test')
+
+    assert boto3_client._config.retries == {'total_max_attempts': 1}
+    assert boto3_client.transfer_controller.logger is boto3_client.logger
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_iter_objects_resumes_failed_page(_client):
+    paginator = FlakyPaginator()
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+        transfer_controller=TransferController(base_delay=0),
+    )
+    await boto3_client.init_connection()
+    objects = [obj async for obj in boto3_client.iter_objects('test', 'folder/')]
+
+    assert [obj['Key'] for obj in objects] == ['a', 'b']
+    assert len(paginator.calls) == 2
+    starting_token = paginator.calls[1]['PaginationConfig']['StartingToken']
+    assert TokenDecoder().decode(starting_token) == {'ContinuationToken': 'token-1'}
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_iter_objects_fan_out_lists_sub_prefixes(_client):
+    keys = ['root/file', 'root/a/1', 'root/a/2', 'root/a/3', 'root/b/1', 'root/c/deep/1']
+    paginator = FakeListingPaginator(keys)
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_paginator = MagicMock(return_value=paginator)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    objects = [obj async for obj in boto3_client.iter_objects('test', 'root/', fan_out=True, concurrency=2)]
+
+    assert sorted(obj['Key'] for obj in objects) == sorted(keys)
+    assert sorted(paginator.prefixes) == [
+        ('root/', '/'),
+        ('root/a/', None),
+        ('root/b/', None),
+        ('root/c/', None),
+    ]
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_skips_unchanged_file(_client, mocker, tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"%s"' % hashlib.md5(b'a' * 10).hexdigest()}
+    put = mocker.patch('httpx.AsyncClient.put')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    res = await boto3_client.upload_file('test', 'file', str(local_file), part_size=4, skip_if_unchanged=True)
+
+    assert res == s3.head_object.return_value
+    put.assert_not_called()
+    s3.create_multipart_upload.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_uploads_changed_file(_client, mocker, tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': 10, 'ETag': '"%s"' % hashlib.md5(b'b' * 10).hexdigest()}
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    await boto3_client.upload_file('test', 'file', str(local_file), part_size=4, skip_if_unchanged=True)
+
+    assert put.call_count == 3
+    s3.create_multipart_upload.assert_called_once_with(Bucket='test', Key='file', Metadata={'part-size': '4'})
+    s3.complete_multipart_upload.assert_called_once()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_skips_unchanged_file_with_stored_part_size(_client, mocker, tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'a' * 10)
+    digests = b''.join(hashlib.md5(part).digest() for part in (b'aaa', b'aaa', b'aaa', b'a'))
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {
+        'ContentLength': 10,
+        'ETag': '"%s-4"' % hashlib.md5(digests).hexdigest(),
+        'Metadata': {'part-size': '3'},
+    }
+    put = mocker.patch('httpx.AsyncClient.put')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    res = await boto3_client.upload_file('test', 'file', str(local_file), part_size=4, skip_if_unchanged=True)
+
+    assert res == s3.head_object.return_value
+    put.assert_not_called()
+    s3.create_multipart_upload.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_file_skips_unchanged_file_uploaded_with_other_part_size(_client, mocker, tmp_path):
+    mib = 1024 * 1024
+    content = b'a' * 20 * mib
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(content)
+    digests = b''.join(hashlib.md5(b'a' * size).digest() for size in (8 * mib, 8 * mib, 4 * mib))
+    s3 = _client.return_value.__aenter__.return_value
+    s3.head_object.return_value = {'ContentLength': len(content), 'ETag': '"%s-3"' % hashlib.md5(digests).hexdigest()}
+    put = mocker.patch('httpx.AsyncClient.put')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    # the object was uploaded in 3 parts of 8MiB, this upload uses 3 parts of 7MiB
+    res = await boto3_client.upload_file('test', 'file', str(local_file), part_size=7 * mib, skip_if_unchanged=True)
+
+    assert res == s3.head_object.return_value
+    put.assert_not_called()
+    s3.create_multipart_upload.assert_not_called()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_part_upload_streams_file_segment(_client, mocker, tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'0123456789')
+    sent = []
+
+    async def _put(url, content, headers, timeout):
+        sent.append((b''.join([bytes(chunk) async for chunk in content]), headers))
+        return Response(status_code=200, headers={'ETag': '"etag"'})
+
+    mocker.patch('httpx.AsyncClient.put', side_effect=_put)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    part = await boto3_client.part_upload('test', '/path', 'test_id', 2, FileSegment(str(local_file), 4, 3))
+    await boto3_client.part_upload('test', '/path', 'test_id', 3, memoryview(bytearray(b'buffer')))
+
+    assert part == {'ETag': 'etag', 'PartNumber': 2}
+    assert sent == [(b'456', {'Content-Length': '3'}), (b'buffer', {'Content-Length': '6'})]
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_part_upload_requires_length_of_async_iterator(_client):
+    async def _content():
+        yield b'content'
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    try:
+        await boto3_client.part_upload('test', '/path', 'test_id', 1, _content())
+    except ValueError as e:
+        assert str(e) == 'content_length is necessary for async iterator content'
+    else:
+        raise AssertionError('ValueError is not raised')
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_sync_down_downloads_changed_objects_only(_client, tmp_path):
+    contents = {'data/a': b'0123456789', 'data/sub/b': b'abc'}
+    objects = [
+        {'Key': 'data/a', 'Size': 10, 'ETag': '"etag-a"'},
+        {'Key': 'data/sub/b', 'Size': 3, 'ETag': '"etag-b"'},
+    ]
+
+    async def _download_file(Bucket, Key, Filename):
+        with open(Filename, 'wb') as f:
+            f.write(contents[Key])
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.download_file.side_effect = _download_file
+    s3.get_paginator = MagicMock(return_value=FakePaginator([{'Contents': objects}]))
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+
+    result = await boto3_client.sync_down('test', 'data', str(tmp_path))
+    assert result['transferred_count'] == 2
+    assert result['transferred_bytes'] == 13
+    assert (tmp_path / 'sub' / 'b').read_bytes() == b'abc'
+
+    result = await boto3_client.sync_down('test', 'data', str(tmp_path))
+    assert result['transferred_count'] == 0
+    assert result['skipped_count'] == 2
+    assert s3.download_file.call_count == 2
+
+    objects[1]['ETag'] = '"etag-b2"'
+    contents['data/sub/b'] = b'abcd'
+    result = await boto3_client.sync_down('test', 'data', str(tmp_path))
+    assert result['transferred_count'] == 1
+    assert (tmp_path / 'sub' / 'b').read_bytes() == b'abcd'
+
+    del objects[0]
+    result = await boto3_client.sync_down('test', 'data', str(tmp_path), delete=True)
+    assert result['deleted_count'] == 1
+    assert not (tmp_path / 'a').exists()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_sync_down_skips_sibling_folder(_client, tmp_path):
+    contents = {'proj/folder/a': b'a', 'proj/folder2/secret.txt': b'secret'}
+    objects = [{'Key': key, 'Size': len(content), 'ETag': '"etag"'} for key, content in contents.items()]
+
+    async def _download_file(Bucket, Key, Filename):
+        with open(Filename, 'wb') as f:
+            f.write(contents[Key])
+
+    paginator = FakePaginator([{'Contents': objects}])
+    s3 = _client.return_value.__aenter__.return_value
+    s3.download_file.side_effect = _download_file
+    s3.get_paginator = MagicMock(return_value=paginator)
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+
+    result = await boto3_client.sync_down('test', 'proj/folder', str(tmp_path))
+
+    assert paginator.params['Prefix'] == 'proj/folder/'
+    assert result['transferred_count'] == 1
+    assert (tmp_path / 'a').read_bytes() == b'a'
+    assert not (tmp_path / '2').exists()
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_sync_up_uploads_changed_files_only(_client, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.put_object.return_value = {'ETag': '"etag"'}
+    s3.delete_objects.return_value = {}
+    listing = []
+    s3.get_paginator = MagicMock(return_value=FakePaginator([{'Contents': listing}]))
+
+    local_dir = tmp_path / 'local'
+    (local_dir / 'sub').mkdir(parents=True)
+    (local_dir / 'a').write_bytes(b'0123456789')
+    (local_dir / 'sub' / 'b').write_bytes(b'abc')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+
+    result = await boto3_client.sync_up(str(local_dir), 'test', 'data')
+    assert result['transferred_count'] == 2
+    uploaded_keys = sorted(args.kwargs['Key'] for args in s3.put_object.call_args_list)
+    assert uploaded_keys == ['data/a', 'data/sub/b']
+
+    listing.extend(
+        [
+            {'Key': 'data/a', 'Size': 10, 'ETag': '"etag"'},
+            {'Key': 'data/sub/b', 'Size': 3, 'ETag': '"etag"'},
+            {'Key': 'datasub/b', 'Size': 3, 'ETag': '"sibling"'},
+        ]
+    )
+    result = await boto3_client.sync_up(str(local_dir), 'test', 'data')
+    assert result['transferred_count'] == 0
+    assert result['skipped_count'] == 2
+    assert s3.put_object.call_count == 2
+
+    (local_dir / 'a').write_bytes(b'changed')
+    (local_dir / 'sub' / 'b').unlink()
+    result = await boto3_client.sync_up(str(local_dir), 'test', 'data', delete=True)
+    assert result['transferred_count'] == 1
+    assert result['deleted_count'] == 1
+    s3.delete_objects.assert_called_once_with(Bucket='test', Delete={'Objects': [{'Key': 'data/sub/b'}], 'Quiet': True})
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_upload_objects_puts_small_files_and_multiparts_large_ones(_client, mocker, tmp_path):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.put_object.return_value = {'ETag': '"small"'}
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload_id'}
+    s3.complete_multipart_upload.return_value = {'ETag': '"large-1"'}
+    s3.generate_presigned_url.return_value = 'http://project/signed'
+    put = mocker.patch('httpx.AsyncClient.put', return_value=Response(status_code=200, headers={'ETag': '"etag"'}))
+
+    (tmp_path / 'small').write_bytes(b'abc')
+    (tmp_path / 'large').write_bytes(b'0123456789')
+    progress = []
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+    result = await boto3_client.upload_objects(
+        'test',
+        [('small', str(tmp_path / 'small')), ('large', str(tmp_path / 'large')), ('missing', str(tmp_path / 'no'))],
+        multipart_threshold=5,
+        progress_callback=progress.append,
+    )
+
+    s3.put_object.assert_called_once_with(Bucket='test', Key='small', Body=b'abc')
+    put.assert_called_once()
+    assert result['uploaded_count'] == 2
+    assert result['uploaded_bytes'] == 13
+    assert result['etags'] == {'small': 'small', 'large': 'large-1'}
+    assert list(result['errors']) == ['missing']
+    assert len(progress) == 3
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_read_range_returns_bytes_of_range(_client):
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_object.side_effect = fake_get_object(b'0123456789')
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+
+    assert await boto3_client.read_range('test', '/path', 2, 5) == b'2345'
+    assert await boto3_client.read_range('test', '/path', 7) == b'789'
+    s3.get_object.assert_called_with(Bucket='test', Key='/path', Range='bytes=7-')
+
+
+@patch('aioboto3.Session.client')
+async def test_boto3_client_read_ranges_fills_buffers(_client):
+    contents = {'a.csv': b'header,row\n1,2\n', 'b.dcm': b'DICM' + b'\0' * 10}
+
+    async def _get_object(Bucket, Key, Range):
+        return await fake_get_object(contents[Key])(Bucket, Key, Range)
+
+    s3 = _client.return_value.__aenter__.return_value
+    s3.get_object.side_effect = _get_object
+
+    boto3_client = Boto3Client(
+        endpoint='project',
+        access_key=PROJECT_CREDENTIALS.get('AccessKeyId'),
+        secret_key=PROJECT_CREDENTIALS.get('SecretAccessKey'),
+    )
+    await boto3_client.init_connection()
+
+    header = bytearray(10)
+    magic = bytearray(4)
+    tail = bytearray(8)
+    sizes = await boto3_client.read_ranges('test', [('a.csv', 0, header), ('b.dcm', 0, magic), ('a.csv', 11, tail)])
+
+    assert sizes == [10, 4, 4]
+    assert header == b'header,row'
+    assert magic == b'DICM'
+    assert tail[:4] == b'1,2\n'
@@ -0,0 +1,57 @@
+import hashlib
+
+from common.object_storage_adaptor.etag import compute_etag
+from common.object_storage_adaptor.etag import etag_matches
+
+MiB = 1024 * 1024
+
+
+def multipart_etag(content: bytes, part_size: int) -> str:
+    digests = []
+    for start in range(0, len(content), part_size):
+        end = start + part_size
+        digests.append(hashlib.md5(content[start:end]).digest())
+    return '%s-%s' % (hashlib.md5(b''.join(digests)).hexdigest(), len(digests))
+
+
+async def test_compute_etag_without_part_size_returns_md5(tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'content')
+
+    assert await compute_etag(str(local_file)) == hashlib.md5(b'content').hexdigest()
+
+
+async def test_compute_etag_with_part_size_returns_multipart_etag(tmp_path):
+    content = bytes(range(256)) * 100
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(content)
+
+    assert await compute_etag(str(local_file), part_size=1000) == multipart_etag(content, 1000)
+
+
+async def test_etag_matches_guesses_part_size_from_number_of_parts(tmp_path):
+    content = b'a' * (2 * MiB + 10)
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(content)
+
+    assert await etag_matches(str(local_file), '"%s"' % multipart_etag(content, MiB), part_size=8 * MiB)
+    assert await etag_matches(str(local_file), hashlib.md5(content).hexdigest(), part_size=8 * MiB)
+    assert not await etag_matches(str(local_file), multipart_etag(b'b' * len(content), MiB), part_size=MiB)
+
+
+async def test_etag_matches_tries_part_sizes_not_dividing_file(tmp_path):
+    for file_size, part_size in [(12 * MiB, 5 * MiB), (20 * MiB, 8 * MiB)]:
+        content = bytes(range(256)) * (file_size // 256)
+        local_file = tmp_path / 'file'
+        local_file.write_bytes(content)
+
+        assert await etag_matches(str(local_file), multipart_etag(content, part_size))
+
+
+async def test_etag_matches_uses_given_part_size(tmp_path):
+    content = b'a' * 10
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(content)
+
+    assert await etag_matches(str(local_file), multipart_etag(content, 3), part_size=3)
+    assert not await etag_matches(str(local_file), multipart_etag(content, 3))
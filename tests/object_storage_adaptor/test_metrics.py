@@ -0,0 +1,93 @@
+from common.object_storage_adaptor.metrics import Histogram
+from common.object_storage_adaptor.metrics import InMemoryMetricsRecorder
+from common.object_storage_adaptor.metrics import get_metrics_recorder
+from common.object_storage_adaptor.metrics import record_bytes
+from common.object_storage_adaptor.metrics import set_metrics_recorder
+from common.object_storage_adaptor.metrics import tracked
+
+
+class FakeClient:
+    client_name = 'FakeClient'
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+
+    @tracked
+    async def get(self, size: int) -> int:
+        record_bytes(size)
+        return size
+
+    @tracked
+    async def get_all(self, sizes: list) -> int:
+        total = 0
+        for size in sizes:
+            total += await self.get(size)
+
+        return total
+
+    @tracked
+    async def fail(self):
+        raise ValueError('error')
+
+    @tracked
+    async def stream(self):
+        yield b'abc'
+        yield b'de'
+
+
+def get_operation(snapshot: dict, operation: str) -> dict:
+    return next(item for item in snapshot['operations'] if item['operation'] == operation)
+
+
+def test_histogram_snapshot_is_cumulative():
+    histogram = Histogram([1, 5])
+    for value in [0.5, 1, 3, 10]:
+        histogram.observe(value)
+
+    assert histogram.snapshot() == {'buckets': [(1, 2), (5, 3), ('+Inf', 4)], 'sum': 14.5, 'count': 4}
+
+
+async def test_tracked_records_count_bytes_and_nested_operations():
+    recorder = InMemoryMetricsRecorder()
+    client = FakeClient(recorder)
+
+    assert await client.get_all([10, 20]) == 30
+
+    snapshot = recorder.snapshot()
+    get = get_operation(snapshot, 'get')
+    assert get['client'] == 'FakeClient'
+    assert get['count'] == 2
+    assert get['bytes'] == 30
+    assert get['latency']['count'] == 2
+    assert get_operation(snapshot, 'get_all')['bytes'] == 30
+
+
+async def test_tracked_records_errors_and_async_generator():
+    recorder = InMemoryMetricsRecorder()
+    client = FakeClient(recorder)
+
+    try:
+        await client.fail()
+    except ValueError:
+        pass
+
+    assert [chunk async for chunk in client.stream()] == [b'abc', b'de']
+
+    snapshot = recorder.snapshot()
+    assert get_operation(snapshot, 'fail')['errors'] == 1
+    assert get_operation(snapshot, 'stream')['bytes'] == 5
+    assert get_operation(snapshot, 'stream')['errors'] == 0
+
+
+async def test_tracked_uses_process_wide_recorder_by_default():
+    default_recorder = get_metrics_recorder()
+    recorder = InMemoryMetricsRecorder()
+    set_metrics_recorder(recorder)
+    try:
+        await FakeClient().get(1)
+    finally:
+        set_metrics_recorder(default_recorder)
+
+    assert get_operation(recorder.snapshot(), 'get')['count'] == 1
+    recorder.reset()
+    assert recorder.snapshot() == {'operations': [], 'pool_wait': []}
@@ -0,0 +1,50 @@
+import mmap
+
+from common.object_storage_adaptor.part_content import FileSegment
+from common.object_storage_adaptor.part_content import get_content_length
+from common.object_storage_adaptor.part_content import to_request_content
+
+
+async def collect(content) -> list:
+    return [chunk async for chunk in content]
+
+
+async def iterate(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_get_content_length_supports_all_content_types(tmp_path):
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'content')
+
+    with open(local_file, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert get_content_length(mapped) == 7
+        mapped.close()
+
+    assert get_content_length('ü') == 2
+    assert get_content_length(b'content') == 7
+    assert get_content_length(memoryview(b'content')[2:]) == 5
+    assert get_content_length(FileSegment(str(local_file), 2, 3)) == 3
+    assert get_content_length(iterate([b'content'])) is None
+
+
+async def test_to_request_content_sends_buffer_slices_without_copy(mocker):
+    mocker.patch('common.object_storage_adaptor.part_content._SEND_CHUNK_SIZE', 4)
+    buffer = bytearray(b'0123456789')
+
+    chunks = await collect(to_request_content(buffer))
+
+    assert [bytes(chunk) for chunk in chunks] == [b'0123', b'4567', b'89']
+    assert all(isinstance(chunk, memoryview) and chunk.obj is buffer for chunk in chunks)
+
+
+async def test_to_request_content_streams_file_segment(mocker, tmp_path):
+    mocker.patch('common.object_storage_adaptor.part_content._SEND_CHUNK_SIZE', 2)
+    local_file = tmp_path / 'file'
+    local_file.write_bytes(b'0123456789')
+
+    chunks = await collect(to_request_content(FileSegment(str(local_file), 3, 5)))
+
+    assert chunks == [b'34', b'56', b'7']
@@ -0,0 +1,55 @@
+from common.object_storage_adaptor.part_size import MAX_PART_SIZE
+from common.object_storage_adaptor.part_size import MIN_PART_SIZE
+from common.object_storage_adaptor.part_size import MiB
+from common.object_storage_adaptor.part_size import PartSizePolicy
+
+
+def test_part_size_policy_uses_default_part_size_without_measurement():
+    policy = PartSizePolicy()
+
+    assert policy.choose_part_size(MiB) == 8 * MiB
+    assert policy.part_timeout(8 * MiB) == 60
+
+
+def test_part_size_policy_respects_part_count_and_size_limits():
+    policy = PartSizePolicy()
+
+    assert policy.choose_part_size(200 * 1024 * MiB) == 21 * MiB
+    assert policy.choose_part_size(100 * 1024 * 1024 * MiB) == MAX_PART_SIZE
+    # the part size of caller is raised only if there will be too many parts
+    assert policy.choose_part_size(40000, part_size=4) == 4
+    assert policy.choose_part_size(100000, part_size=4) == 10
+
+
+def test_part_size_policy_grows_part_size_with_throughput():
+    policy = PartSizePolicy(target_part_seconds=10)
+    policy.record_part(10 * MiB, 1)
+
+    assert policy.part_throughput == 10 * MiB
+    assert policy.choose_part_size(1024 * MiB) == 100 * MiB
+    assert policy.part_timeout(100 * MiB) == 60
+    assert policy.part_timeout(200 * MiB) == 80
+
+    policy.record_part(MiB, 1)
+    assert policy.choose_part_size(1024 * MiB) == 73 * MiB
+
+    slow_policy = PartSizePolicy(target_part_seconds=10)
+    slow_policy.record_part(1024, 1)
+    assert slow_policy.choose_part_size(1024 * MiB) == MIN_PART_SIZE
+    assert slow_policy.part_timeout(MIN_PART_SIZE) == 4 * MIN_PART_SIZE / 1024
+
+
+def test_part_size_policy_adjusts_concurrency_by_efficiency():
+    policy = PartSizePolicy(max_concurrency=8, initial_concurrency=4)
+    assert policy.choose_concurrency(2) == 2
+    assert policy.choose_concurrency(100) == 4
+
+    policy.record_part(MiB, 1)
+    policy.record_transfer(4 * MiB, 1, 4)
+    assert policy.concurrency == 8
+
+    policy.record_transfer(8 * MiB, 1, 8)
+    assert policy.concurrency == 8
+
+    policy.record_transfer(2 * MiB, 1, 8)
+    assert policy.concurrency == 4
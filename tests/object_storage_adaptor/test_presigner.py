@@ -0,0 +1,56 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import boto3
+from botocore.client import Config
+
+from common.object_storage_adaptor import presigner as presigner_module
+from common.object_storage_adaptor.presigner import S3Presigner
+
+SIGN_TIME = datetime(2022, 7, 1, 12, 0, 0)
+
+
+def boto3_presigned_url(endpoint: str, client_method: str, params: dict, expires: int) -> str:
+    session = boto3.Session(aws_access_key_id='access', aws_secret_access_key='secret', aws_session_token='token')
+    client = session.client('s3', endpoint_url=endpoint, config=Config(signature_version='s3v4'))
+    with patch('botocore.auth.datetime') as _datetime:
+        _datetime.datetime.utcnow.return_value = SIGN_TIME
+        return client.generate_presigned_url(client_method, Params=params, ExpiresIn=expires)
+
+
+def signature(url: str) -> str:
+    return url.split('X-Amz-Signature=')[1]
+
+
+def test_presigner_download_url_matches_boto3_signature():
+    key = 'folder name/ü+file~.txt'
+    expected = boto3_presigned_url('http://project:9000', 'get_object', {'Bucket': 'test', 'Key': key}, 3600)
+
+    presigner = S3Presigner('http://project:9000', 'access', 'secret', 'token')
+    presigned_url = presigner.presign('GET', 'test', key, 3600, now=SIGN_TIME)
+
+    assert presigned_url.startswith('http://project:9000/test/folder%20name/%C3%BC%2Bfile~.txt?')
+    assert signature(presigned_url) == signature(expected)
+
+
+def test_presigner_upload_part_url_matches_boto3_signature():
+    params = {'Bucket': 'test', 'Key': 'file', 'UploadId': 'upload/id=', 'PartNumber': 3}
+    expected = boto3_presigned_url('https://project:443', 'upload_part', params, 60)
+
+    presigner = S3Presigner('https://project:443', 'access', 'secret', 'token')
+    presigned_url = presigner.presign(
+        'PUT', 'test', 'file', 60, query={'partNumber': 3, 'uploadId': 'upload/id='}, now=SIGN_TIME
+    )
+
+    assert signature(presigned_url) == signature(expected)
+
+
+def test_presigner_reuses_signing_key_within_a_day():
+    presigner = S3Presigner('http://project', 'access', 'secret')
+
+    with patch.object(presigner_module, '_hmac_sha256', wraps=presigner_module._hmac_sha256) as _hmac:
+        presigner.presign('GET', 'test', 'first', 60, now=SIGN_TIME)
+        presigner.presign('GET', 'test', 'second', 60, now=SIGN_TIME)
+
+    # four rounds to derive the signing key only once
+    assert _hmac.call_count == 4
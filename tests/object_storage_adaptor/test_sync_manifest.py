@@ -0,0 +1,41 @@
+from common.object_storage_adaptor.sync_manifest import SyncManifest
+from common.object_storage_adaptor.sync_manifest import join_key
+from common.object_storage_adaptor.sync_manifest import relative_key
+from common.object_storage_adaptor.sync_manifest import walk_local_files
+
+
+def test_relative_key_maps_key_into_local_directory():
+    assert relative_key('data/sub/file', 'data') == 'sub/file'
+    assert relative_key('data/sub/file', 'data/') == 'sub/file'
+    assert relative_key('data/sub/', 'data') is None
+    assert relative_key('data/../file', 'data') is None
+    assert relative_key('data2/secret', 'data') is None
+    assert relative_key('file', '') == 'file'
+    assert join_key('data', 'sub/file') == 'data/sub/file'
+    assert join_key('data/', 'sub/file') == 'data/sub/file'
+    assert join_key('', 'file') == 'file'
+
+
+def test_sync_manifest_is_bound_to_bucket_prefix(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    manifest = SyncManifest(path, 'test', 'data')
+    manifest.set('file', 10, 1.5, 'etag')
+    manifest.save()
+
+    loaded = SyncManifest.load(path, 'test', 'data')
+    assert loaded.is_unchanged('file', 10, 1.5, 'etag')
+    assert loaded.is_unchanged('file', 10, etag='etag')
+    assert not loaded.is_unchanged('file', 10, 2.5)
+    assert not loaded.is_unchanged('file', 11)
+    assert SyncManifest.load(path, 'test', 'other').entries == {}
+    assert SyncManifest.load(str(tmp_path / 'missing.json'), 'test', 'data').entries == {}
+
+
+def test_walk_local_files_skips_manifest(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'file').write_bytes(b'abc')
+    (tmp_path / 'manifest.json').write_text('{}')
+
+    files = walk_local_files(str(tmp_path), str(tmp_path / 'manifest.json'))
+
+    assert [(relative_path, size) for relative_path, size, _ in files] == [('sub/file', 3)]
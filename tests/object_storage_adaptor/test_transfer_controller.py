@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+from botocore.exceptions import ClientError
+from botocore.exceptions import EndpointConnectionError
+from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import ParamValidationError
+from botocore.exceptions import ReadTimeoutError
+
+from common.object_storage_adaptor.transfer_controller import TransferController
+from common.object_storage_adaptor.transfer_controller import is_retryable
+from common.object_storage_adaptor.transfer_controller import is_throttled
+
+
+def client_error(code: str, status_code: int) -> ClientError:
+    return ClientError(
+        {'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'op'
+    )
+
+
+def test_transfer_controller_classifies_errors():
+    assert is_throttled(client_error('SlowDown', 503))
+    assert is_retryable(client_error('SlowDown', 503))
+    assert is_retryable(client_error('InternalError', 500))
+    assert is_retryable(httpx.ConnectError('connection reset'))
+    assert not is_throttled(client_error('InternalError', 500))
+    assert not is_retryable(client_error('NoSuchKey', 404))
+    assert not is_retryable(ValueError('error'))
+
+
+def test_transfer_controller_retries_only_connection_errors_of_botocore():
+    assert is_retryable(EndpointConnectionError(endpoint_url='http://project'))
+    assert is_retryable(ReadTimeoutError(endpoint_url='http://project'))
+    assert not is_retryable(ParamValidationError(report='invalid bucket'))
+    assert not is_retryable(NoCredentialsError())
+
+
+def test_transfer_controller_backoff_is_capped_with_jitter():
+    controller = TransferController(base_delay=1, max_delay=5)
+
+    for attempt in range(10):
+        assert 0 <= controller.backoff(attempt) <= min(5, 2**attempt)
+
+
+async def test_transfer_controller_retries_until_success():
+    controller = TransferController(base_delay=0, initial_concurrency=8)
+    errors = [client_error('SlowDown', 503), client_error('InternalError', 500)]
+
+    async def _operation():
+        if errors:
+            raise errors.pop(0)
+        return 'result'
+
+    assert await controller.run(_operation) == 'result'
+    assert controller.limit == 4
+    assert controller.in_flight == 0
+
+
+async def test_transfer_controller_raises_non_retryable_error_at_once():
+    controller = TransferController(base_delay=0)
+    calls = []
+
+    async def _operation():
+        calls.append(1)
+        raise client_error('NoSuchKey', 404)
+
+    try:
+        await controller.run(_operation)
+    except ClientError:
+        pass
+    else:
+        raise AssertionError('ClientError is not raised')
+
+    assert len(calls) == 1
+
+    try:
+        await controller.run(lambda: _operation(), max_retries=0)
+    except ClientError:
+        pass
+
+    assert len(calls) == 2
+    assert controller.in_flight == 0
+
+
+async def test_transfer_controller_limits_and_grows_concurrency():
+    controller = TransferController(initial_concurrency=2, max_concurrency=3)
+    running = []
+    max_running = []
+
+    async def _operation():
+        running.append(1)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    await asyncio.gather(*[controller.run(_operation) for _ in range(4)])
+
+    assert max(max_running) == 2
+    # the limit is increased after a full window of successes
+    assert controller.limit == 3
+
+
+async def test_transfer_controller_passes_slot_of_cancelled_waiter():
+    controller = TransferController(min_concurrency=1, max_concurrency=1, initial_concurrency=1)
+
+    async def _operation():
+        return 'done'
+
+    await controller._acquire()
+    cancelled = asyncio.ensure_future(controller.run(_operation))
+    waiting = asyncio.ensure_future(controller.run(_operation))
+    await asyncio.sleep(0)
+
+    # the slot is handed to the first waiter, which is cancelled before it runs
+    controller._release()
+    cancelled.cancel()
+
+    assert await asyncio.wait_for(waiting, 1) == 'done'
+    assert controller.in_flight == 0
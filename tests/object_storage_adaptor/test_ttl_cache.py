@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from common.object_storage_adaptor.ttl_cache import TTLCache
+
+
+def test_ttl_cache_returns_value_before_expire():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('key', 'value')
+
+    assert cache.get('key') == 'value'
+    assert len(cache) == 1
+
+
+@patch('common.object_storage_adaptor.ttl_cache.time.monotonic')
+def test_ttl_cache_drops_expired_value(monotonic):
+    monotonic.return_value = 100
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('key', 'value')
+    cache.set('short', 'value', ttl=1)
+
+    monotonic.return_value = 105
+    assert cache.get('short') is None
+    assert cache.get('key') == 'value'
+
+    monotonic.return_value = 110
+    assert cache.get('key', 'default') == 'default'
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used_value():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.get('first')
+    cache.set('third', 3)
+
+    assert cache.get('second') is None
+    assert cache.get('first') == 1
+    assert cache.get('third') == 3
@@ -0,0 +1,104 @@
+# Copyright (C) 2022 Indoc Research
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import zipfile
+from datetime import datetime
+from datetime import timezone
+
+import pytest
+
+from common.object_storage_adaptor.zip_stream import stream_zip
+
+
+class FakeClient:
+    def __init__(self, contents: dict, failed_key: str = None):
+        self.contents = contents
+        self.failed_key = failed_key
+        self.max_reading = 0
+        self._reading = 0
+
+    async def iter_objects(self, bucket, prefix):
+        self.listed_prefix = prefix
+        for key, content in self.contents.items():
+            yield {'Key': key, 'Size': len(content), 'LastModified': datetime(2022, 5, 1, tzinfo=timezone.utc)}
+
+    async def stream_object(self, bucket, key, chunk_size):
+        self._reading += 1
+        self.max_reading = max(self.max_reading, self._reading)
+        try:
+            if key == self.failed_key:
+                raise ConnectionError('connection reset')
+            content = self.contents[key]
+            for offset in range(0, len(content), chunk_size):
+                end = offset + chunk_size
+                yield content[offset:end]
+        finally:
+            self._reading -= 1
+
+
+async def _collect(iterator) -> bytes:
+    return b''.join([chunk async for chunk in iterator])
+
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+async def test_stream_zip_archives_objects_under_prefix(compression):
+    contents = {
+        'project/folder/': b'',
+        'project/folder/a.txt': b'a' * 1000,
+        'project/folder/sub/b.bin': bytes(range(256)) * 10,
+        'project/folder/empty': b'',
+    }
+    client = FakeClient(contents)
+
+    archive = await _collect(
+        stream_zip(client, 'test', 'project/folder', chunk_size=100, read_ahead_chunks=2, compression=compression)
+    )
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.namelist() == ['a.txt', 'sub/b.bin', 'empty']
+        assert zip_file.read('a.txt') == b'a' * 1000
+        assert zip_file.read('sub/b.bin') == bytes(range(256)) * 10
+        assert zip_file.read('empty') == b''
+        assert zip_file.getinfo('a.txt').date_time == (2022, 5, 1, 0, 0, 0)
+        assert zip_file.testzip() is None
+
+
+async def test_stream_zip_skips_sibling_folder():
+    client = FakeClient({'proj/folder/a': b'a', 'proj/folder2/secret.txt': b'secret'})
+
+    archive = await _collect(stream_zip(client, 'test', 'proj/folder'))
+
+    assert client.listed_prefix == 'proj/folder/'
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert zip_file.namelist() == ['a']
+
+
+async def test_stream_zip_reads_at_most_concurrency_objects():
+    contents = {'folder/%s' % i: b'x' * 500 for i in range(10)}
+    client = FakeClient(contents)
+
+    archive = await _collect(stream_zip(client, 'test', 'folder/', concurrency=3, chunk_size=100, read_ahead_chunks=1))
+
+    assert client.max_reading <= 3
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        assert len(zip_file.namelist()) == 10
+
+
+async def test_stream_zip_raises_error_of_object():
+    client = FakeClient({'folder/a': b'a', 'folder/b': b'b'}, failed_key='folder/b')
+
+    with pytest.raises(ConnectionError):
+        await _collect(stream_zip(client, 'test', 'folder/'))